@@ -1,24 +1,99 @@
+import os
+import copy
+import hashlib
+import threading
 import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
 from yaml.loader import SafeLoader
+from dotenv import load_dotenv
 
-def setup_authentication():
-    import yaml
-    from yaml.loader import SafeLoader
-    import streamlit_authenticator as stauth
+def get_auth_config_file():
+    """
+    Arquivo de credenciais e grupos dos usuários (AUTH_CONFIG_FILE, padrão
+    config.yaml).
+
+    A autenticação roda antes de connect_to_database, por isso o .env é
+    carregado aqui (variáveis já definidas no ambiente não são alteradas).
+    """
+    load_dotenv(".env")
+    return os.getenv("AUTH_CONFIG_FILE", "config.yaml")
+
+# Grupo de usuários sem grupo definido no arquivo
+DEFAULT_GROUP = "SEM_GRUPO"
+
+_config_lock = threading.Lock()
+_config_cache = {}  # caminho -> {'stat', 'hash', 'config', 'groups'}
+
+def load_auth_config(path=None):
+    """
+    Retorna as configurações de autenticação, lendo o arquivo apenas quando
+    ele muda.
+
+    A cada chamada só o mtime e o tamanho do arquivo são consultados; se
+    mudarem, o conteúdo é lido e o YAML só é interpretado de novo se o hash
+    também tiver mudado. O mapa usuário -> grupo (usado na restrição por
+    gerente) é calculado junto com cada nova versão.
+
+    Args:
+        path (str, optional): Caminho do arquivo de configuração (padrão:
+            get_auth_config_file())
+
+    Returns:
+        dict: 'config' (YAML interpretado), 'groups' (usuário -> grupo) e
+            'hash' (versão do conteúdo)
+    """
+    path = path or get_auth_config_file()
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
 
-    # Carregar configurações de autenticação
-    with open("config.yaml", "r") as file:
-        config = yaml.load(file, Loader=SafeLoader)
+    with _config_lock:
+        entry = _config_cache.get(path)
+        if entry is not None and entry['stat'] == signature:
+            return entry
 
-    authenticator = stauth.Authenticate(
-        config['credentials'],
+        with open(path, "rb") as file:
+            content = file.read()
+        digest = hashlib.sha256(content).hexdigest()
+
+        if entry is None or entry['hash'] != digest:
+            config = yaml.load(content, Loader=SafeLoader)
+            groups = {
+                username: (user_data or {}).get("group", DEFAULT_GROUP)
+                for username, user_data in config["credentials"]["usernames"].items()
+            }
+            entry = {'hash': digest, 'config': config, 'groups': groups}
+
+        entry['stat'] = signature
+        _config_cache[path] = entry
+        return entry
+
+def get_user_group(username, path=None):
+    """Grupo do usuário (ou DEFAULT_GROUP se não houver)."""
+    return load_auth_config(path)['groups'].get(username, DEFAULT_GROUP)
+
+def get_authenticator(path=None):
+    """
+    Cria o autenticador a partir das configurações em memória.
+
+    O autenticador é criado a cada execução, como exige o
+    streamlit-authenticator: o gerenciador de cookies lê os cookies do
+    navegador apenas ao ser criado, e reaproveitá-lo entre reruns impede o
+    login pelo cookie (lembrar usuário). Cada um recebe sua própria cópia
+    das credenciais, que o autenticador altera.
+    """
+    config = load_auth_config(path)['config']
+    return stauth.Authenticate(
+        copy.deepcopy(config['credentials']),
         config['cookie']['name'],
         config['cookie']['key'],
         config['cookie']['expiry_days']
     )
 
+def setup_authentication():
+    # Configurações lidas do arquivo apenas quando ele muda
+    authenticator = get_authenticator()
+
     try:
         authenticator.login()
     except Exception as e:
@@ -29,8 +104,7 @@ def setup_authentication():
     username = st.session_state.get("username", "")
 
     # Recuperar grupo do usuário ou definir um padrão
-    user_data = config["credentials"]["usernames"].get(username, {})
-    user_group = user_data.get("group", "SEM_GRUPO")  # Garante que sempre retorna algo
+    user_group = get_user_group(username)  # Garante que sempre retorna algo
 
     if auth_status:
         st.sidebar.success(f"Bem-vindo, {name}!")
@@ -0,0 +1,267 @@
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime
+from unittest import mock
+import numpy as np
+import pandas as pd
+import comissao
+import data_processing
+from data_processing import get_gerente_mapping, rename_gerente, normalize_gerentes, process_data, format_dataframes
+from pdf_generator import generate_pdf_report, generate_full_pdf_report
+from rollup import build_rollup, aggregate_rollup
+
+def make_gerentes(rows, seed=42):
+    """Gera uma coluna de gerentes no formato do banco (nomes brutos)."""
+    rng = np.random.default_rng(seed)
+    mapping = get_gerente_mapping()
+    raw_names = list(mapping) + [name.lower() + " " for name in mapping] + [
+        "GERENTE SEM MAPEAMENTO", None
+    ]
+    return pd.Series(rng.choice(np.array(raw_names, dtype=object), size=rows), name='gerente')
+
+def timed(func, repeat=3):
+    """Executa func repetidas vezes e retorna o menor tempo (segundos)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_gerentes(rows, memory=False):
+    """Compara rename_gerente via apply com normalize_gerentes."""
+    gerentes = make_gerentes(rows)
+
+    apply_time = timed(lambda: gerentes.apply(rename_gerente))
+    object_time = timed(lambda: normalize_gerentes(gerentes.to_frame()))
+    categorical = gerentes.astype('category')
+    category_time = timed(lambda: normalize_gerentes(categorical.to_frame()))
+
+    # Os dois caminhos precisam produzir os mesmos nomes
+    expected = gerentes.apply(rename_gerente)
+    result = normalize_gerentes(gerentes.to_frame())['gerente'].astype(object)
+    assert expected.fillna('<NA>').equals(result.fillna('<NA>'))
+
+    return {
+        'rows': rows,
+        'apply_s': apply_time,
+        'normalize_object_s': object_time,
+        'normalize_category_s': category_time,
+        'speedup_category': apply_time / category_time if category_time else float('inf'),
+    }
+
+def make_operations(rows, seed=42, raw_gerentes=False):
+    """
+    Gera operações sintéticas no formato de fato_operacoes.
+
+    A quantidade de cedentes cresce com o volume (de 100 a 5.000), com
+    concentração de operações nos maiores cedentes; cada cedente pertence a
+    um gerente, como na dimensão de cedentes. As datas cobrem dois anos de
+    dias úteis (ordenadas, como no cache local) e os valores seguem uma
+    distribuição log-normal.
+
+    Args:
+        rows (int): Número de operações
+        seed (int, optional): Semente do gerador
+        raw_gerentes (bool, optional): Gerentes no formato do banco (nomes
+            brutos, com variações e cedentes sem gerente), para medir também
+            a renomeação. Se False, os gerentes já vêm renomeados.
+
+    Returns:
+        pandas.DataFrame: Operações sintéticas
+    """
+    rng = np.random.default_rng(seed)
+
+    # Cedentes com concentração (lei de potência) e gerente fixo por cedente
+    n_cedentes = min(5_000, max(100, rows // 100))
+    weights = 1 / np.arange(1, n_cedentes + 1) ** 1.1
+    cedente_codes = rng.choice(n_cedentes, size=rows, p=weights / weights.sum())
+    cedentes = pd.Index([f"CEDENTE {i:05d}" for i in range(n_cedentes)])
+
+    mapping = get_gerente_mapping()
+    if raw_gerentes:
+        names = list(mapping) + [name.lower() + " " for name in mapping] + [
+            "GERENTE SEM MAPEAMENTO", None
+        ]
+    else:
+        names = sorted(set(mapping.values()))
+    gerente_names = np.array(names, dtype=object)[rng.integers(0, len(names), n_cedentes)]
+    gerentes = pd.Categorical(gerente_names[cedente_codes])
+
+    days = pd.bdate_range('2023-01-01', '2024-12-31')
+    valor_bruto = np.round(rng.lognormal(10, 1.2, rows), 2)
+    prazo_medio = np.round(rng.gamma(4, 10, rows), 1)
+    prazo_medio[rng.random(rows) < 0.01] = np.nan
+
+    return pd.DataFrame({
+        'cedente': pd.Categorical.from_codes(cedente_codes, categories=cedentes),
+        'gerente': gerentes,
+        'etapa': pd.Categorical(rng.choice(['OPERADO', 'LIQUIDADO', 'PENDENTE'], rows, p=[0.7, 0.2, 0.1])),
+        'data': days[np.sort(rng.integers(0, len(days), rows))],
+        'prazo_medio': prazo_medio,
+        'valor_desagio': np.round(valor_bruto * rng.uniform(0.01, 0.05, rows), 2),
+        'valor_bruto': valor_bruto,
+    })
+
+def measure(func, memory=False, setup=None):
+    """
+    Executa func e retorna (segundos, pico de memória em MB, resultado).
+
+    O pico é medido com tracemalloc apenas se memory=True, em uma execução
+    separada, já que o rastreamento deixa a execução bem mais lenta. Se
+    setup for informado, cada execução recebe um novo valor de setup() como
+    argumento, preparado fora da medição.
+    """
+    argument = None if setup is None else setup()
+
+    start = time.perf_counter()
+    result = func() if setup is None else func(argument)
+    elapsed = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        argument = None if setup is None else setup()
+        tracemalloc.start()
+        func() if setup is None else func(argument)
+        peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    return elapsed, peak, result
+
+def benchmark_full_pdf(rows, memory=False):
+    """Tempo e pico de memória do relatório PDF completo."""
+    df = make_operations(rows)
+    output = io.BytesIO()
+
+    def run():
+        output.seek(0)
+        output.truncate()
+        generate_full_pdf_report(df, output)
+
+    elapsed, peak, _ = measure(run, memory)
+
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'us_per_row': elapsed / rows * 1e6,
+        'peak_MB': peak,
+        'pdf_MB': len(output.getvalue()) / 1024 ** 2,
+    }
+
+class StreamlitStub:
+    """
+    Substitui o Streamlit nas funções do pipeline, sem interface: os filtros
+    de período usam o valor padrão e os multiselects retornam os valores de
+    selections (por rótulo), se existirem entre as opções.
+    """
+    def __init__(self, selections=None):
+        self.selections = selections or {}
+        self.sidebar = self
+
+    def date_input(self, label, value=None, **kwargs):
+        return value
+
+    def multiselect(self, label, options, **kwargs):
+        return [value for value in self.selections.get(label, []) if value in options]
+
+    def __getattr__(self, name):
+        # subheader, warning, bar_chart etc. não fazem nada
+        return lambda *args, **kwargs: None
+
+def benchmark_pipeline(rows, memory=False):
+    """
+    Tempo e pico de memória de cada etapa do relatório de comissionamento
+    sobre operações sintéticas, sem interface nem banco de dados.
+
+    As etapas são encadeadas como na página: a saída de uma é a entrada da
+    seguinte.
+    """
+    df = make_operations(rows, raw_gerentes=True)
+    stub = StreamlitStub()
+    results = []
+
+    def record(stage, func, setup=None):
+        elapsed, peak, output = measure(func, memory, setup)
+        results.append({
+            'rows': rows,
+            'stage': stage,
+            'seconds': elapsed,
+            'us_per_row': elapsed / rows * 1e6,
+            'peak_MB': peak,
+        })
+        return output
+
+    with mock.patch.object(data_processing, 'st', stub), mock.patch.object(comissao, 'st', stub):
+        # process_data marca o DataFrame (gerentes renomeados, ordenação):
+        # cada execução recebe uma cópia nova, preparada fora da medição
+        df_filtered = record('process_data', lambda data: process_data(data), setup=lambda: df.copy())
+        df_grouped, _, _ = record('format_dataframes', lambda: format_dataframes(df_filtered, numeric=True))
+        record('generate_pdf_report', lambda: generate_pdf_report(df_filtered))
+        record('create_visualizations', lambda: comissao.create_visualizations(df_grouped, 'VALOR OPERADO'))
+        cube = record('build_rollup', lambda: build_rollup(df_filtered))
+        record('aggregate_rollup', lambda: aggregate_rollup(cube))
+
+    return results
+
+BENCHMARKS = {
+    'gerentes': (benchmark_gerentes, [10_000, 100_000, 1_000_000]),
+    'pdf': (benchmark_full_pdf, [1_000, 10_000, 100_000]),
+    'pipeline': (benchmark_pipeline, [10_000, 100_000, 1_000_000]),
+}
+
+def environment():
+    """Versões relevantes para comparar resultados entre execuções."""
+    return {
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+    }
+
+def compare(results, baseline_path):
+    """Razão entre os tempos atuais e os de um arquivo de resultados anterior."""
+    with open(baseline_path, "r") as file:
+        baseline = pd.DataFrame(json.load(file)['results'])
+
+    current = pd.DataFrame(results)
+    keys = [column for column in ['rows', 'stage'] if column in current.columns]
+    time_column = 'seconds' if 'seconds' in current.columns else current.columns[1]
+
+    merged = current.merge(baseline, on=keys, suffixes=('', '_baseline'))
+    merged['ratio'] = merged[time_column] / merged[time_column + '_baseline']
+    return merged[keys + [time_column + '_baseline', time_column, 'ratio']]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do relatório de comissionamento.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), nargs="?", default="gerentes")
+    parser.add_argument("--rows", type=int, nargs="+")
+    parser.add_argument("--memory", action="store_true", help="mede também o pico de memória (mais lento)")
+    parser.add_argument("--output", metavar="ARQUIVO", help="grava os resultados em JSON")
+    parser.add_argument("--compare", metavar="ARQUIVO", help="compara com resultados gravados por --output")
+    args = parser.parse_args()
+
+    func, default_rows = BENCHMARKS[args.benchmark]
+    results = []
+    for rows in args.rows or default_rows:
+        result = func(rows, memory=args.memory)
+        results.extend(result if isinstance(result, list) else [result])
+    print(pd.DataFrame(results).to_string(index=False))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({
+                'benchmark': args.benchmark,
+                'created': datetime.now().isoformat(),
+                'memory': args.memory,
+                'environment': environment(),
+                'results': results,
+            }, file, indent=2)
+
+    if args.compare:
+        print()
+        print(compare(results, args.compare).to_string(index=False))
@@ -1,46 +1,88 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
+from tracing import traced
 
-def create_bar_chart(df, group_column, value_column='valor_bruto', title=None, limit=10):
+# Gráficos exibidos na página: coluna de agrupamento e título
+CHART_COLUMNS = [
+    ('cedente', "Valor Operado por Cedente"),
+    ('gerente', "Valor Operado por Gerente"),
+    ('etapa', "Valor Operado por Etapa"),
+]
+
+def top_values(df, group_column, value_column='valor_bruto', limit=10):
     """
-    Cria um gráfico de barras para visualizar valores agrupados por uma coluna.
+    Soma value_column por group_column e retorna os limit maiores valores.
+
+    A soma é feita sobre os códigos da coluna (bincount) e apenas os maiores
+    valores são selecionados (nlargest), sem ordenar todos os grupos.
 
     Args:
-        df (pandas.DataFrame): DataFrame com os dados
+        df (pandas.DataFrame): Dados já agrupados (tabela agrupada ou cubo
+            diário) ou linhas de detalhe
         group_column (str): Nome da coluna para agrupar
         value_column (str): Nome da coluna com os valores a serem somados
-        title (str, optional): Título do gráfico. Se None, usa o nome da coluna.
-        limit (int, optional): Limite de itens a mostrar. Padrão é 10.
+        limit (int, optional): Limite de itens. Padrão é 10.
+
+    Returns:
+        pandas.Series: Valor operado por item, do maior para o menor
     """
-    if group_column not in df.columns:
-        return
+    series = df[group_column]
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+
+    categories = series.cat.categories
+    codes = series.cat.codes.to_numpy()
+    valid = codes >= 0
+    values = pd.to_numeric(df[value_column], errors='coerce').fillna(0).to_numpy(dtype='float64')
 
-    # Definir título
-    chart_title = title if title else f"Valor Operado por {group_column.title()}"
-    st.subheader(chart_title)
+    present = np.bincount(codes[valid], minlength=len(categories)) > 0
+    totals = np.bincount(codes[valid], weights=values[valid], minlength=len(categories))
 
-    # Criar uma cópia para o gráfico com valores numéricos
-    df_chart = df.groupby(group_column)[value_column].sum().reset_index()
-    df_chart = df_chart.rename(columns={value_column: 'VALOR OPERADO'})
+    result = pd.Series(totals[present], index=categories[present], name='VALOR OPERADO')
+    result.index.name = group_column
+    return result.nlargest(limit)
 
-    # Ordenar por valor operado e limitar
-    df_chart = df_chart.sort_values('VALOR OPERADO', ascending=False).head(limit)
+def chart_data(df, value_column='valor_bruto', limit=10):
+    """Séries de todos os gráficos da página, por coluna de agrupamento."""
+    return {
+        column: top_values(df, column, value_column, limit)
+        for column, _ in CHART_COLUMNS
+        if column in df.columns
+    }
 
-    # Criar gráfico
-    st.bar_chart(df_chart.set_index(group_column)['VALOR OPERADO'])
+@st.cache_data(ttl=300, show_spinner=False)
+def cached_chart_data(_df, key, value_column='valor_bruto', limit=10):
+    """
+    chart_data guardado em cache pela chave do estado dos filtros, de modo
+    que reruns causados por outros widgets não recalculem os gráficos.
+    """
+    return chart_data(_df, value_column, limit)
 
-def create_visualizations(df_filtered):
+@traced()
+def create_visualizations(df_grouped, value_column='valor_bruto', cache_key=None):
     """
-    Cria visualizações gráficas baseadas nos dados filtrados
+    Cria visualizações gráficas a partir de um resultado já agrupado
+
+    Todas as séries são derivadas do mesmo DataFrame (o cubo diário ou as
+    células agrupadas, muito menores que as linhas de detalhe). As células
+    devem manter as chaves nulas: uma operação sem gerente, por exemplo,
+    continua no gráfico de cedentes. A tabela agrupada exibida não serve,
+    pois descarta essas operações.
 
     Args:
-        df_filtered (pandas.DataFrame): DataFrame com filtros aplicados
+        df_grouped (pandas.DataFrame): Dados agrupados (ou de detalhe) com os
+            filtros aplicados
+        value_column (str, optional): Coluna com o valor operado
+        cache_key (str, optional): Chave do estado dos filtros; se informada,
+            as séries são guardadas em cache por ela
     """
-    # Criar gráfico para cedentes
-    create_bar_chart(df_filtered, 'cedente', title="Valor Operado por Cedente")
-
-    # Criar gráfico para gerentes
-    create_bar_chart(df_filtered, 'gerente', title="Valor Operado por Gerente")
+    if cache_key is None:
+        series = chart_data(df_grouped, value_column)
+    else:
+        series = cached_chart_data(df_grouped, cache_key, value_column)
 
-    # Podemos adicionar facilmente mais visualizações
-    if 'etapa' in df_filtered.columns:
-        create_bar_chart(df_filtered, 'etapa', title="Valor Operado por Etapa")
\ No newline at end of file
+    for column, title in CHART_COLUMNS:
+        if column in series:
+            st.subheader(title)
+            st.bar_chart(series[column])
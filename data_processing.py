@@ -1,57 +1,196 @@
+import os
+import threading
+import numpy as np
 import pandas as pd
 import streamlit as st
-import locale
+import yaml
+from yaml.loader import SafeLoader
+from facet_index import get_facet_index, facet_options, facet_rows
+from tracing import traced
+from formatting import (
+    format_currency, format_decimal,
+    format_currency_series, format_decimal_series, format_date_series
+)
 
-# Configurar locale para formatação de números com vírgula para decimais
-try:
-    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-except:
-    try:
-        locale.setlocale(locale.LC_ALL, 'Portuguese_Brazil.1252')
-    except:
-        pass  # Se ambos falharem, usaremos formatação manual
+# Renomear gerentes
+DEFAULT_GERENTE_MAPPING = {
+    "*COMERCIAL - RFA - ADITAR ***": "RFA",
+    "*COMERCIAL - ALX": "ALX",
+    "*COMERCIAL - ANDRE TAVARES ***": "ANDRE TAVARES",
+    "LEANDRO APARECIDO": "LEANDRO AP",
+    "*COMERCIAL - LUIS FERNANDO DE JESUS LOMBELLO": "LUIS FERNANDO",
+    "*COMERCIAL - MANUEL SANJI GOMES KOMIYAMA": "MANUEL",
+    "*COMERCIAL - ROLAN GABRIEL SYLVESTRE MARINO": "ROLAN",
+    "*COMERCIAL RODRIGO WEISSINGER CARVALHO***": "RODRIGO",
+    "DMX FUNDO DE INVESTIMENTO EM DIREITOS CREDITORIOS": "DMX Capital"
+}
+
+def load_gerente_mapping(path=None):
+    """
+    Carrega o mapeamento de nomes de gerentes.
 
-# Formatação de valores
-def format_currency(value):
-    return f"R$ {value:,.2f}".replace(".", "X").replace(",", ".").replace("X", ",")
+    Lê o arquivo YAML indicado (ou GERENTE_MAPPING_FILE, padrão
+    "gerentes.yaml"), no formato "NOME NO BANCO: NOME EXIBIDO". Se o arquivo
+    não existir, usa o mapeamento padrão.
+    """
+    path = path or os.getenv("GERENTE_MAPPING_FILE", "gerentes.yaml")
+    if not os.path.exists(path):
+        return dict(DEFAULT_GERENTE_MAPPING)
 
-def format_decimal(value, digits=2):
-    return f"{value:.{digits}f}".replace(".", ",")
+    with open(path, "r") as file:
+        mapping = yaml.load(file, Loader=SafeLoader) or {}
 
-def format_short_date(date):
-    if pd.isna(date):
-        return ""
-    return date.strftime('%d/%m/%Y')
+    # As chaves são comparadas com o nome normalizado (strip + upper)
+    return {str(raw).strip().upper(): str(display) for raw, display in mapping.items()}
+
+_mapping_lock = threading.Lock()
+_mapping_cache = {}  # caminho -> (mtime do arquivo ou None, mapeamento)
+
+def get_gerente_mapping():
+    """
+    Mapeamento de gerentes em uso (ver load_gerente_mapping).
+
+    GERENTE_MAPPING_FILE é lido a cada uso (depois do .env carregado por
+    database.connect_to_database) e o arquivo só é lido de novo quando muda.
+    """
+    path = os.getenv("GERENTE_MAPPING_FILE", "gerentes.yaml")
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+
+    with _mapping_lock:
+        entry = _mapping_cache.get(path)
+        if entry is None or entry[0] != mtime:
+            entry = (mtime, load_gerente_mapping(path))
+            _mapping_cache[path] = entry
+        return entry[1]
 
-# Renomear gerentes
 def rename_gerente(gerente):
     if pd.isna(gerente):
         return gerente
 
-    mapping = {
-        "*COMERCIAL - RFA - ADITAR ***": "RFA",
-        "*COMERCIAL - ALX": "ALX",
-        "*COMERCIAL - ANDRE TAVARES ***": "ANDRE TAVARES",
-        "LEANDRO APARECIDO": "LEANDRO AP",
-        "*COMERCIAL - LUIS FERNANDO DE JESUS LOMBELLO": "LUIS FERNANDO",
-        "*COMERCIAL - MANUEL SANJI GOMES KOMIYAMA": "MANUEL",
-        "*COMERCIAL - ROLAN GABRIEL SYLVESTRE MARINO": "ROLAN",
-        "*COMERCIAL RODRIGO WEISSINGER CARVALHO***": "RODRIGO",
-        "DMX FUNDO DE INVESTIMENTO EM DIREITOS CREDITORIOS": "DMX Capital"
-    }
-
     gerente_normalizado = gerente.strip().upper()
-    return mapping.get(gerente_normalizado, gerente)
+    return get_gerente_mapping().get(gerente_normalizado, gerente)
+
+@traced()
+def normalize_gerentes(df, column='gerente'):
+    """
+    Renomeia os gerentes do DataFrame de forma vetorizada.
+
+    O mapeamento é aplicado apenas aos valores distintos (categorias) e o
+    resultado é uma coluna category. O DataFrame é marcado em df.attrs, de
+    modo que chamadas seguintes sobre o mesmo conjunto de dados não refazem
+    o trabalho.
+
+    Args:
+        df (pandas.DataFrame): Operações com a coluna de gerentes no formato do banco
+        column (str, optional): Nome da coluna de gerentes
+
+    Returns:
+        pandas.DataFrame: O mesmo DataFrame, com os gerentes renomeados
+    """
+    if column not in df.columns or df.attrs.get('gerentes_normalizados'):
+        return df
+
+    values = df[column]
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+
+    categories = values.cat.categories.to_series(index=range(len(values.cat.categories)))
+    renamed = categories.astype(str).str.strip().str.upper().map(get_gerente_mapping())
+    renamed = renamed.fillna(categories)
+
+    # Nomes diferentes no banco podem virar o mesmo gerente: recodificar
+    new_categories = pd.Index(sorted(renamed.unique()))
+    indexer = np.append(new_categories.get_indexer(renamed), -1)
+    codes = indexer[values.cat.codes.to_numpy()]
+
+    df[column] = pd.Categorical.from_codes(codes, categories=new_categories)
+    df.attrs['gerentes_normalizados'] = True
+    return df
+
+def gerente_raw_names(display_names):
+    """
+    Mapeamento reverso de rename_gerente.
+
+    Args:
+        display_names (list): Nomes de gerente como exibidos na interface
+
+    Returns:
+        tuple: (nomes normalizados do banco que são renomeados para algum dos
+            nomes exibidos, nomes exibidos que correspondem literalmente ao
+            valor do banco por não estarem no mapeamento)
+    """
+    display_names = set(display_names)
+    mapping = get_gerente_mapping()
+    normalized = sorted(raw for raw, display in mapping.items() if display in display_names)
+    literal = sorted(name for name in display_names if name.strip().upper() not in mapping)
+    return normalized, literal
 
 # Funções auxiliares para filtros
-def apply_date_filter(df, df_filtered):
-    """Aplica filtro de data ao DataFrame."""
+def index_by_date(df):
+    """
+    Ordena o conjunto de dados por data e guarda o período em df.attrs.
+
+    Com os dados ordenados, um filtro de período vira duas buscas binárias
+    (searchsorted) e um fatiamento, sem comparar linha a linha. A ordenação
+    é feita uma vez por conjunto carregado; chamadas seguintes não fazem nada.
+
+    Args:
+        df (pandas.DataFrame): Operações com a coluna 'data'
+
+    Returns:
+        pandas.DataFrame: Operações ordenadas por data (datas nulas no final)
+    """
+    if 'data' not in df.columns or df.attrs.get('data_ordenada'):
+        return df
+
+    # Dados já ordenados (ex.: cache local) são apenas marcados, sem cópia
+    dates = df['data'].to_numpy()
+    valid = len(dates) - np.isnat(dates).sum()
+    already_sorted = (
+        df.index.equals(pd.RangeIndex(len(df)))
+        and not np.isnat(dates[:valid]).any()
+        and (valid < 2 or bool((dates[1:valid] >= dates[:valid - 1]).all()))
+    )
+    if not already_sorted:
+        df = df.sort_values('data', kind='mergesort', na_position='last', ignore_index=True)
+
+    min_date = df['data'].min()
+    max_date = df['data'].max()
+    df.attrs['data_ordenada'] = True
+    df.attrs['data_min'] = min_date.date() if pd.notna(min_date) else None
+    df.attrs['data_max'] = max_date.date() if pd.notna(max_date) else None
+    return df
+
+def slice_date_range(df, start_date, end_date):
+    """
+    Retorna as operações entre start_date e end_date (inclusive) de um
+    DataFrame ordenado por index_by_date, por busca binária.
+    """
+    dates = df['data'].to_numpy()
+    start = dates.searchsorted(np.datetime64(start_date, 'ns'), side='left')
+    end = dates.searchsorted(np.datetime64(end_date, 'ns') + np.timedelta64(1, 'D'), side='left')
+    return df.iloc[start:end]
+
+# Chaves da seleção de filtros (as mesmas aceitas por database.build_operations_query)
+FILTER_KEYS = {'cedente': 'cedentes', 'gerente': 'gerentes', 'etapa': 'etapas'}
+
+def apply_date_filter(df, df_filtered, selection=None):
+    """Aplica filtro de data ao DataFrame, registrando o período em selection."""
     if 'data' not in df.columns:
         st.sidebar.warning("A coluna 'DATA' não foi encontrada na tabela")
         return df_filtered
 
-    min_date = df['data'].min().date()
-    max_date = df['data'].max().date()
+    indexed = df.attrs.get('data_ordenada', False)
+    if indexed:
+        min_date = df.attrs['data_min']
+        max_date = df.attrs['data_max']
+    else:
+        min_date = df['data'].min().date()
+        max_date = df['data'].max().date()
+
+    if min_date is None:
+        st.sidebar.warning("Nenhuma operação com data disponível")
+        return df_filtered
 
     st.sidebar.subheader("Filtro por Período")
     date_range = st.sidebar.date_input(
@@ -63,39 +202,123 @@ def apply_date_filter(df, df_filtered):
 
     if len(date_range) == 2:
         start_date, end_date = date_range
-        mask = (df['data'].dt.date >= start_date) & (df['data'].dt.date <= end_date)
+        if selection is not None:
+            selection['start_date'] = start_date
+            selection['end_date'] = end_date
+        if indexed:
+            return slice_date_range(df, start_date, end_date)
+
+        dates = df['data'].dt.normalize()
+        mask = (dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))
         return df.loc[mask]
 
     return df_filtered
 
-def apply_column_filter(df_filtered, column_name, title):
-    """Aplica filtro genérico por coluna ao DataFrame."""
+def apply_column_filter(df_filtered, column_name, title, facets=None, selection=None):
+    """
+    Aplica filtro genérico por coluna ao DataFrame, registrando os valores
+    escolhidos em selection.
+
+    Com o índice de facetas (facet_index.get_facet_index) as opções e as
+    linhas selecionadas vêm do índice, sem recalcular valores distintos nem
+    percorrer a coluna com isin.
+    """
     if column_name not in df_filtered.columns:
         st.sidebar.warning(f"A coluna '{title}' não foi encontrada na tabela")
         return df_filtered
 
     st.sidebar.subheader(f"Filtro por {title}")
-    values = sorted(df_filtered[column_name].dropna().unique())
+    if facets is not None and column_name in facets:
+        values = facet_options(facets, column_name, df_filtered.index).index.tolist()
+    else:
+        values = sorted(df_filtered[column_name].dropna().unique())
     selected_values = st.sidebar.multiselect(f"Selecione os {title.lower()}s", values)
 
     if selected_values:
+        if selection is not None:
+            selection[FILTER_KEYS.get(column_name, column_name)] = selected_values
+        if facets is not None and column_name in facets:
+            rows = facet_rows(facets, column_name, selected_values, df_filtered.index)
+            return df_filtered.loc[rows]
         return df_filtered[df_filtered[column_name].isin(selected_values)]
 
     return df_filtered
 
+def select_filters(options):
+    """
+    Renderiza os filtros da barra lateral a partir das opções disponíveis e
+    retorna a seleção, sem filtrar nenhum DataFrame.
+
+    Usado quando os filtros são aplicados diretamente na consulta SQL.
+
+    Args:
+        options (pandas.DataFrame): Combinações distintas de cedente, gerente
+            (já renomeado) e etapa, com as colunas data_min e data_max
+
+    Returns:
+        dict: Seleção com as chaves start_date, end_date, cedentes, gerentes
+            e etapas (apenas as que foram preenchidas)
+    """
+    selection = {}
+
+    if options.empty:
+        st.sidebar.warning("Nenhuma operação disponível")
+        return selection
+
+    min_date = options['data_min'].min().date()
+    max_date = options['data_max'].max().date()
+
+    st.sidebar.subheader("Filtro por Período")
+    date_range = st.sidebar.date_input(
+        "Selecione o período",
+        value=[min_date, max_date],
+        min_value=min_date,
+        max_value=max_date
+    )
+
+    if len(date_range) == 2:
+        start_date, end_date = date_range
+        selection['start_date'] = start_date
+        selection['end_date'] = end_date
+        options = options[
+            (options['data_max'].dt.date >= start_date) & (options['data_min'].dt.date <= end_date)
+        ]
+
+    # Filtros em cascata: as opções de cada filtro respeitam os anteriores
+    for column_name, title in [('cedente', 'Cedente'), ('gerente', 'Gerente'), ('etapa', 'Etapa')]:
+        st.sidebar.subheader(f"Filtro por {title}")
+        values = sorted(options[column_name].dropna().unique())
+        selected_values = st.sidebar.multiselect(f"Selecione os {title.lower()}s", values)
+
+        if selected_values:
+            selection[FILTER_KEYS[column_name]] = selected_values
+            options = options[options[column_name].isin(selected_values)]
+
+    return selection
+
 # Filtros via Streamlit
-def process_data(df):
-    """Processa e filtra os dados com base nas seleções do usuário."""
-    # Normalizar nomes de gerentes
-    if 'gerente' in df.columns:
-        df['gerente'] = df['gerente'].apply(rename_gerente)
+@traced()
+def process_data(df, selection=None):
+    """
+    Processa e filtra os dados com base nas seleções do usuário.
+
+    Args:
+        df (pandas.DataFrame): Operações carregadas
+        selection (dict, optional): Se informado, recebe a seleção de filtros
+            feita na barra lateral (mesmas chaves de select_filters)
+    """
+    # Normalizar nomes de gerentes e ordenar por data (sem custo se já feito)
+    df = index_by_date(normalize_gerentes(df))
+
+    # Índice de facetas construído uma vez por conjunto de dados
+    facets = get_facet_index(df)
 
     # Aplicar filtros em sequência
     df_filtered = df
-    df_filtered = apply_date_filter(df, df_filtered)
-    df_filtered = apply_column_filter(df_filtered, 'cedente', 'Cedente')
-    df_filtered = apply_column_filter(df_filtered, 'gerente', 'Gerente')
-    df_filtered = apply_column_filter(df_filtered, 'etapa', 'Etapa')
+    df_filtered = apply_date_filter(df, df_filtered, selection)
+    df_filtered = apply_column_filter(df_filtered, 'cedente', 'Cedente', facets, selection)
+    df_filtered = apply_column_filter(df_filtered, 'gerente', 'Gerente', facets, selection)
+    df_filtered = apply_column_filter(df_filtered, 'etapa', 'Etapa', facets, selection)
 
     return df_filtered
 
@@ -120,8 +343,13 @@ def get_aggregation_dict(df):
 
     return agg_dict
 
-def format_grouped_data(df_grouped, has_prazo_medio):
-    """Formata os dados agrupados."""
+def format_grouped_data(df_grouped, has_prazo_medio, numeric=False):
+    """
+    Formata os dados agrupados.
+
+    Com numeric=True apenas renomeia as colunas, mantendo os valores
+    numéricos para formatação na exibição (formatting.style_report_table).
+    """
     # Renomear colunas
     df_grouped = df_grouped.rename(columns={
         'data': 'data',
@@ -130,41 +358,47 @@ def format_grouped_data(df_grouped, has_prazo_medio):
         'valor_bruto': 'VALOR OPERADO'
     })
 
-    # Aplicar formatação
-    df_grouped['data'] = df_grouped['data'].apply(format_short_date)
+    if numeric:
+        return df_grouped
+
+    # Aplicar formatação (coluna inteira de uma vez)
+    df_grouped['data'] = format_date_series(df_grouped['data'])
     if has_prazo_medio:
-        df_grouped['PRAZO MEDIO'] = df_grouped['PRAZO MEDIO'].apply(lambda x: format_decimal(x, 2))
-    df_grouped['DESAGIO'] = df_grouped['DESAGIO'].apply(format_currency)
-    df_grouped['VALOR OPERADO'] = df_grouped['VALOR OPERADO'].apply(format_currency)
+        df_grouped['PRAZO MEDIO'] = format_decimal_series(df_grouped['PRAZO MEDIO'], 2)
+    df_grouped['DESAGIO'] = format_currency_series(df_grouped['DESAGIO'])
+    df_grouped['VALOR OPERADO'] = format_currency_series(df_grouped['VALOR OPERADO'])
 
     return df_grouped
 
 def calculate_totals(df_filtered, has_prazo_medio):
     """Calcula os totais para o relatório."""
-    total_desagio = df_filtered['valor_desagio'].sum()
-    total_valor_operado = df_filtered['valor_bruto'].sum()
+    # Somas e produtos em float64, qualquer que seja o tipo compacto da coluna
+    valor_bruto = df_filtered['valor_bruto'].astype('float64')
+    total_desagio = df_filtered['valor_desagio'].astype('float64').sum()
+    total_valor_operado = valor_bruto.sum()
 
     prazo_medio_geral = 0
     if has_prazo_medio and total_valor_operado > 0:
         prazo_medio_geral = (
-            (df_filtered['prazo_medio'] * df_filtered['valor_bruto']).sum() / total_valor_operado
+            (df_filtered['prazo_medio'].astype('float64') * valor_bruto).sum() / total_valor_operado
         )
 
     return total_desagio, total_valor_operado, prazo_medio_geral
 
-def create_totals_row(df_grouped, total_desagio, total_valor_operado, prazo_medio_geral, has_captador, has_prazo_medio):
+def create_totals_row(df_grouped, total_desagio, total_valor_operado, prazo_medio_geral, has_captador, has_prazo_medio,
+                      numeric=False):
     """Cria a linha de totais para o DataFrame."""
     totals_data = {
         'cedente': ['TOTAL'],
         'gerente': [''],
         'etapa': [''],
-        'data': [''],
-        'DESAGIO': [format_currency(total_desagio)],
-        'VALOR OPERADO': [format_currency(total_valor_operado)]
+        'data': [pd.NaT if numeric else ''],
+        'DESAGIO': [total_desagio if numeric else format_currency(total_desagio)],
+        'VALOR OPERADO': [total_valor_operado if numeric else format_currency(total_valor_operado)]
     }
 
     if has_prazo_medio:
-        totals_data['PRAZO MEDIO'] = [format_decimal(prazo_medio_geral, 2)]
+        totals_data['PRAZO MEDIO'] = [prazo_medio_geral if numeric else format_decimal(prazo_medio_geral, 2)]
 
     if has_captador:
         totals_data['captador'] = ['TOTAL']
@@ -175,18 +409,19 @@ def create_totals_row(df_grouped, total_desagio, total_valor_operado, prazo_medi
     return pd.DataFrame(totals_data)
 
 # Agrupamento, cálculo e formatação
-def format_dataframes(df_filtered):
+def aggregate_data(df_filtered):
     """
-    Agrupa, calcula e formata os dados para exibição.
+    Agrupa os dados e calcula os totais em pandas.
+
+    É o backend de referência; database.fetch_aggregated_data produz o mesmo
+    resultado diretamente no PostgreSQL.
 
     Args:
         df_filtered (pandas.DataFrame): DataFrame filtrado
 
     Returns:
-        tuple: (df_grouped, df_grouped_with_totals, summary_stats)
+        tuple: (df_grouped numérico, (total_desagio, total_valor_operado, prazo_medio_geral))
     """
-    # Verificar colunas disponíveis
-    has_captador = 'captador' in df_filtered.columns
     has_prazo_medio = 'prazo_medio' in df_filtered.columns
 
     # Definir colunas para agrupamento
@@ -195,21 +430,47 @@ def format_dataframes(df_filtered):
     # Definir dicionário de agregação
     agg_dict = get_aggregation_dict(df_filtered)
 
-    # Agrupar dados
-    df_grouped = df_filtered.groupby(group_cols).agg(**agg_dict).reset_index()
-
-    # Formatar dados agrupados
-    df_grouped = format_grouped_data(df_grouped, has_prazo_medio)
+    # Agrupar dados (colunas category agrupam só os valores presentes; a
+    # ordenação explícita mantém a ordem alfabética dos grupos)
+    df_grouped = (
+        df_filtered.groupby(group_cols, observed=True)
+        .agg(**agg_dict)
+        .reset_index()
+        .sort_values(group_cols, ignore_index=True)
+    )
 
     # Calcular totais
-    total_desagio, total_valor_operado, prazo_medio_geral = calculate_totals(
-        df_filtered, has_prazo_medio
-    )
+    totals = calculate_totals(df_filtered, has_prazo_medio)
+
+    return df_grouped, totals
+
+@traced()
+def format_aggregated_data(df_grouped, totals, numeric=False):
+    """
+    Formata os dados já agrupados e monta a linha de totais.
+
+    Args:
+        df_grouped (pandas.DataFrame): Resultado numérico do agrupamento
+        totals (tuple): (total_desagio, total_valor_operado, prazo_medio_geral)
+        numeric (bool, optional): Mantém os valores numéricos, para formatação
+            apenas na exibição. Defaults to False.
+
+    Returns:
+        tuple: (df_grouped, df_grouped_with_totals, summary_stats)
+    """
+    # Verificar colunas disponíveis
+    has_captador = 'captador' in df_grouped.columns
+    has_prazo_medio = 'prazo_medio' in df_grouped.columns
+
+    total_desagio, total_valor_operado, prazo_medio_geral = totals
+
+    # Formatar dados agrupados
+    df_grouped = format_grouped_data(df_grouped, has_prazo_medio, numeric)
 
     # Criar linha de totais
     totals_row = create_totals_row(
         df_grouped, total_desagio, total_valor_operado, prazo_medio_geral,
-        has_captador, has_prazo_medio
+        has_captador, has_prazo_medio, numeric
     )
 
     # Concatenar com o DataFrame agrupado
@@ -223,3 +484,19 @@ def format_dataframes(df_filtered):
     }
 
     return df_grouped, df_grouped_with_totals, summary_stats
+
+@traced()
+def format_dataframes(df_filtered, numeric=False):
+    """
+    Agrupa, calcula e formata os dados para exibição.
+
+    Args:
+        df_filtered (pandas.DataFrame): DataFrame filtrado
+        numeric (bool, optional): Mantém os valores numéricos, para formatação
+            apenas na exibição. Defaults to False.
+
+    Returns:
+        tuple: (df_grouped, df_grouped_with_totals, summary_stats)
+    """
+    df_grouped, totals = aggregate_data(df_filtered)
+    return format_aggregated_data(df_grouped, totals, numeric)
@@ -1,11 +1,62 @@
 import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from pandas.api.types import union_categoricals
+from sqlalchemy import create_engine, text, bindparam
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
+from data_processing import get_gerente_mapping, gerente_raw_names
+from tracing import traced
 
-def connect_to_database():
+# Registro de engines compartilhadas pelo processo (uma por URL de conexão)
+_engines = {}
+_engines_lock = threading.Lock()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que registra o tempo gasto para obter cada conexão."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        connection = super().connect()
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.checkouts += 1
+            self.total_wait += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+
+        return connection
+
+def get_pool_config():
     """
-    Estabelece a conexão com o banco de dados PostgreSQL.
+    Lê a configuração do pool de conexões a partir do ambiente.
+
+    Variáveis suportadas (com os valores padrão):
+        POSTGRES_POOL_SIZE (5), POSTGRES_MAX_OVERFLOW (10),
+        POSTGRES_POOL_TIMEOUT (30 s), POSTGRES_POOL_RECYCLE (1800 s)
+    """
+    return {
+        'pool_size': int(os.getenv("POSTGRES_POOL_SIZE", "5")),
+        'max_overflow': int(os.getenv("POSTGRES_MAX_OVERFLOW", "10")),
+        'pool_timeout': float(os.getenv("POSTGRES_POOL_TIMEOUT", "30")),
+        'pool_recycle': int(os.getenv("POSTGRES_POOL_RECYCLE", "1800")),
+    }
+
+def get_database_url():
+    """
+    Monta a URL de conexão do PostgreSQL a partir do arquivo .env.
     """
     # Carregar variáveis do .env
     load_dotenv(".env")
@@ -22,17 +73,81 @@ def connect_to_database():
         raise ValueError("Uma ou mais variáveis de ambiente estão ausentes. Verifique o arquivo .env!")
 
     # Criar a URL de conexão para SQLAlchemy
-    conn_url = f"postgresql+psycopg2://{username}:{password}@{server}:{port}/{database}"
+    return f"postgresql+psycopg2://{username}:{password}@{server}:{port}/{database}"
+
+def get_engine(conn_url=None):
+    """
+    Retorna a engine compartilhada do processo, criando-a na primeira chamada.
+
+    Todas as sessões do Streamlit reutilizam a mesma engine e, portanto, o
+    mesmo pool de conexões. As conexões são testadas antes do uso
+    (pre-ping) e recicladas periodicamente.
+
+    Args:
+        conn_url (str, optional): URL de conexão. Se None, usa a URL
+            montada a partir do .env na primeira chamada.
+    """
+    key = conn_url or "default"
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                conn_url or get_database_url(),
+                poolclass=InstrumentedQueuePool,
+                pool_pre_ping=True,
+                **get_pool_config()
+            )
+            _engines[key] = engine
 
-    # Criar engine de conexão
-    engine = create_engine(conn_url)
     return engine
 
-def fetch_data(engine):
+def get_pool_stats(engine=None):
     """
-    Executa a consulta SQL e retorna os dados em um DataFrame.
+    Retorna estatísticas do pool de conexões da engine compartilhada.
+
+    Returns:
+        dict: tamanho do pool, conexões em uso, overflow e tempos de espera
     """
-    query = """
+    engine = engine or get_engine()
+    pool = engine.pool
+
+    stats = {
+        'pool_size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+    }
+
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats['checkouts'] = pool.checkouts
+            stats['total_wait'] = pool.total_wait
+            stats['max_wait'] = pool.max_wait
+            stats['avg_wait'] = pool.total_wait / pool.checkouts if pool.checkouts else 0.0
+
+    return stats
+
+def dispose_engines():
+    """Fecha todas as conexões e limpa o registro de engines."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+def connect_to_database():
+    """
+    Estabelece a conexão com o banco de dados PostgreSQL.
+
+    Retorna a engine compartilhada do processo; chamadas repetidas (a cada
+    rerun do Streamlit) não criam novas engines nem relêem o .env.
+    """
+    return get_engine()
+
+BASE_QUERY = """
     SELECT 
         f.cedente,
         d.gerente,
@@ -46,16 +161,580 @@ def fetch_data(engine):
         ON f.cpf_cnpj_cedente = d.cpf_cnpj
     """
 
+OPTIONS_QUERY = """
+    SELECT 
+        f.cedente,
+        d.gerente,
+        f.etapa, 
+        MIN(f.data) AS data_min, 
+        MAX(f.data) AS data_max 
+    FROM fato_operacoes f
+    LEFT JOIN dimcedentesconsolidado d 
+        ON f.cpf_cnpj_cedente = d.cpf_cnpj
+    """
+
+# Carga em partições: apenas a tabela fato, sem o JOIN (ver fetch_data_partitioned)
+FACT_QUERY = """
+    SELECT 
+        f.cedente,
+        f.cpf_cnpj_cedente,
+        f.etapa, 
+        f.data, 
+        f.prazo_medio, 
+        f.valor_desagio, 
+        f.valor_bruto 
+    FROM fato_operacoes f
+    """
+
+DIMENSION_QUERY = """
+    SELECT 
+        d.cpf_cnpj,
+        d.gerente
+    FROM dimcedentesconsolidado d
+    """
+
+DATE_BOUNDS_QUERY = """
+    SELECT 
+        MIN(f.data) AS data_min, 
+        MAX(f.data) AS data_max 
+    FROM fato_operacoes f
+    """
+
+def build_operations_query(start_date=None, end_date=None, cedentes=None,
+                           gerentes=None, etapas=None, user_group=None,
+                           cpf_cnpjs=None, missing_date=False,
+                           base_query=BASE_QUERY, suffix=""):
+    """
+    Monta a consulta de operações com os filtros aplicados no banco.
+
+    Todos os valores são passados como parâmetros (bind), nunca concatenados
+    ao SQL. Os gerentes são informados como exibidos na interface e
+    convertidos de volta para os nomes do banco.
+
+    Args:
+        start_date (date, optional): Data inicial (inclusive)
+        end_date (date, optional): Data final (inclusive)
+        cedentes (list, optional): Cedentes selecionados
+        gerentes (list, optional): Gerentes selecionados (nomes exibidos)
+        etapas (list, optional): Etapas selecionadas
+        user_group (str, optional): Grupo do usuário. Se diferente de "ADM",
+            restringe as operações ao gerente do próprio usuário.
+        cpf_cnpjs (list, optional): Documentos dos cedentes (f.cpf_cnpj_cedente)
+        missing_date (bool, optional): Apenas operações sem data
+        base_query (str, optional): Consulta sobre fato_operacoes (f) e
+            dimcedentesconsolidado (d) à qual o WHERE é acrescentado
+        suffix (str, optional): Trecho acrescentado após o WHERE (GROUP BY etc.)
+
+    Returns:
+        tuple: (sqlalchemy.sql.expression.TextClause, dict de parâmetros)
+    """
+    conditions = []
+    params = {}
+    expanding = []
+
+    if start_date is not None:
+        conditions.append("f.data >= :start_date")
+        params['start_date'] = start_date
+
+    if end_date is not None:
+        # Limite exclusivo no dia seguinte para incluir todo o último dia
+        conditions.append("f.data < :end_date")
+        params['end_date'] = end_date + timedelta(days=1)
+
+    if missing_date:
+        conditions.append("f.data IS NULL")
+
+    if cedentes:
+        conditions.append("f.cedente IN :cedentes")
+        params['cedentes'] = list(cedentes)
+        expanding.append('cedentes')
+
+    if etapas:
+        conditions.append("f.etapa IN :etapas")
+        params['etapas'] = list(etapas)
+        expanding.append('etapas')
+
+    if cpf_cnpjs is not None:
+        conditions.append("f.cpf_cnpj_cedente IN :cpf_cnpjs")
+        params['cpf_cnpjs'] = list(cpf_cnpjs)
+        expanding.append('cpf_cnpjs')
+
+    # Segurança por linha: usuários não ADM só recebem as próprias operações
+    gerente_filters = []
+    if gerentes:
+        gerente_filters.append(('gerentes', gerentes))
+    if user_group is not None and user_group != "ADM":
+        gerente_filters.append(('grupo', [user_group]))
+
+    for prefix, names in gerente_filters:
+        normalized, literal = gerente_raw_names(names)
+        clauses = []
+        if normalized:
+            clauses.append(f"UPPER(TRIM(d.gerente)) IN :{prefix}_normalizados")
+            params[f'{prefix}_normalizados'] = normalized
+            expanding.append(f'{prefix}_normalizados')
+        if literal:
+            clauses.append(f"d.gerente IN :{prefix}_literais")
+            params[f'{prefix}_literais'] = literal
+            expanding.append(f'{prefix}_literais')
+        conditions.append("(" + " OR ".join(clauses) + ")")
+
+    query = base_query
+    if conditions:
+        query += "    WHERE " + "\n      AND ".join(conditions) + "\n"
+    query += suffix
+
+    statement = text(query)
+    if expanding:
+        statement = statement.bindparams(*[bindparam(name, expanding=True) for name in expanding])
+
+    return statement, params
+
+# Tipos de armazenamento das colunas de operações: textos de baixa
+# cardinalidade como category e números reduzidos quando não há perda
+OPERATIONS_SCHEMA = {
+    'cedente': 'category',
+    'gerente': 'category',
+    'etapa': 'category',
+    'data': 'datetime',
+    'prazo_medio': 'number',
+    'valor_desagio': 'number',
+    'valor_bruto': 'number',
+}
+
+# Tabela fato com a chave da dimensão (cargas em partições)
+FACT_SCHEMA = {**OPERATIONS_SCHEMA, 'cpf_cnpj_cedente': 'category'}
+FACT_KEY = 'cpf_cnpj_cedente'
+
+def get_fetch_chunksize():
+    """
+    Número de linhas lidas por vez do banco (FETCH_CHUNKSIZE, padrão 100000).
+
+    Lido a cada carga, depois do .env carregado por connect_to_database.
+    """
+    return int(os.getenv("FETCH_CHUNKSIZE", "100000"))
+
+def get_fetch_partitions():
+    """
+    Número de consultas paralelas por período na carga das operações
+    (FETCH_PARTITIONS, padrão 1 = uma única consulta com JOIN).
+    """
+    return int(os.getenv("FETCH_PARTITIONS", "1"))
+
+def get_dimension_ttl():
+    """Validade, em segundos, da dimensão de cedentes em memória (DIMENSION_TTL, padrão 3600)."""
+    return int(os.getenv("DIMENSION_TTL", "3600"))
+
+_dimensions = {}  # URL da engine -> (momento da carga, DataFrame)
+_dimensions_lock = threading.Lock()
+
+def downcast_number(series):
+    """
+    Reduz o tipo de uma coluna numérica sem perda de precisão.
+
+    A coluna vai para float32 apenas se todos os valores forem representados
+    exatamente; caso contrário fica em float64. Colunas com valores inteiros
+    não são reduzidas para tipos inteiros pequenos: produtos como
+    prazo_medio * valor_bruto transbordariam sem aviso.
+    """
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+
+    as_float32 = values.astype('float32')
+    if np.array_equal(as_float32.astype('float64'), values, equal_nan=True):
+        return pd.Series(as_float32, index=series.index, name=series.name)
+
+    return series.astype('float64')
+
+def compact_dataframe(df, schema=OPERATIONS_SCHEMA):
+    """
+    Converte as colunas de operações para os tipos compactos do schema.
+
+    Args:
+        df (pandas.DataFrame): Operações como retornadas pelo banco
+        schema (dict, optional): Tipo de armazenamento por coluna
+
+    Returns:
+        pandas.DataFrame: DataFrame com os tipos compactos
+    """
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+
+        if kind == 'category':
+            df[column] = df[column].astype('category')
+        elif kind == 'datetime':
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif kind == 'number':
+            df[column] = downcast_number(df[column])
+
+    return df
+
+def concat_compact(chunks, schema=OPERATIONS_SCHEMA):
+    """
+    Concatena blocos compactados preservando as colunas category.
+
+    Categorias diferentes entre blocos são unificadas, evitando a volta para
+    object que pd.concat faria.
+    """
+    if not chunks:
+        return pd.DataFrame(columns=list(schema))
+    if len(chunks) == 1:
+        return chunks[0]
+
+    categorical = {}
+    for column, kind in schema.items():
+        if kind == 'category' and column in chunks[0].columns:
+            categorical[column] = union_categoricals(
+                [chunk[column] for chunk in chunks], sort_categories=True
+            )
+
+    df = pd.concat([chunk.drop(columns=list(categorical)) for chunk in chunks], ignore_index=True)
+    for column, values in categorical.items():
+        df[column] = values
+
+    # Blocos reduzidos para tipos diferentes voltam a ser compactados juntos
+    for column, kind in schema.items():
+        if kind == 'number' and column in df.columns:
+            df[column] = downcast_number(df[column])
+
+    return df[chunks[0].columns]
+
+def memory_usage_report(df):
+    """
+    Relatório de uso de memória por coluna.
+
+    Returns:
+        pandas.DataFrame: Tipo, bytes e percentual do total de cada coluna
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': usage,
+        'MB': usage / 1024 ** 2,
+        'percentual': usage / usage.sum() * 100 if usage.sum() else 0.0,
+    })
+    report.loc['TOTAL'] = ['', usage.sum(), usage.sum() / 1024 ** 2, 100.0]
+    return report
+
+def iter_chunks(engine, query, params, chunksize, schema=OPERATIONS_SCHEMA):
+    """
+    Lê uma consulta em blocos por cursor no servidor, compactando cada bloco.
+
+    Apenas o bloco atual fica em memória; a conexão é devolvida ao pool ao
+    fim da leitura.
+    """
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(query, conn, params=params, chunksize=chunksize):
+            yield compact_dataframe(chunk, schema)
+
+def _read_chunks(engine, query, params, chunksize, schema=OPERATIONS_SCHEMA):
+    """Lê todos os blocos de uma consulta (ver iter_chunks)."""
+    return list(iter_chunks(engine, query, params, chunksize, schema))
+
+@traced()
+def fetch_data(engine, chunksize=None, partitions=None, **filters):
+    """
+    Executa a consulta SQL e retorna os dados em um DataFrame.
+
+    As linhas são lidas em blocos por um cursor no servidor e cada bloco é
+    compactado (OPERATIONS_SCHEMA) antes do próximo, mantendo limitado o pico
+    de memória durante a carga.
+
+    Args:
+        engine: Engine do SQLAlchemy
+        chunksize (int, optional): Linhas por bloco (padrão: get_fetch_chunksize)
+        partitions (int, optional): Se maior que 1, carrega com
+            fetch_data_partitioned (consultas paralelas por período; padrão:
+            get_fetch_partitions)
+        **filters: Filtros aceitos por build_operations_query (start_date,
+            end_date, cedentes, gerentes, etapas, user_group, missing_date)
+    """
+    chunksize = chunksize or get_fetch_chunksize()
+    partitions = partitions or get_fetch_partitions()
+    if partitions > 1:
+        return fetch_data_partitioned(engine, partitions, chunksize, **filters)
+
+    query, params = build_operations_query(**filters)
+    return concat_compact(_read_chunks(engine, query, params, chunksize))
+
+def dimension_version(dimension):
+    """Hash do conteúdo da dimensão de cedentes (detecta atualizações)."""
+    hashed = pd.util.hash_pandas_object(dimension, index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:16]
+
+def fetch_dimension(engine, max_age=None):
+    """
+    Retorna a dimensão de cedentes (cpf_cnpj -> gerente), guardada em memória
+    por max_age segundos.
+
+    A dimensão é pequena e muda pouco; a versão do conteúdo fica em
+    attrs['versao'].
+    """
+    max_age = get_dimension_ttl() if max_age is None else max_age
+    key = str(engine.url)
+    with _dimensions_lock:
+        entry = _dimensions.get(key)
+        if entry is not None and time.time() - entry[0] <= max_age:
+            return entry[1]
+
     with engine.connect() as conn:
-        df = pd.read_sql(query, conn)
+        dimension = pd.read_sql(text(DIMENSION_QUERY), conn)
+    dimension['gerente'] = dimension['gerente'].astype('category')
+    dimension.attrs['versao'] = dimension_version(dimension)
+
+    with _dimensions_lock:
+        _dimensions[key] = (time.time(), dimension)
+    return dimension
 
-    # Conversão de data
-    if 'data' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['data']):
-        df['data'] = pd.to_datetime(df['data'], errors='coerce')
+def join_gerentes(facts, dimension, keep_key=False):
+    """
+    Acrescenta o gerente às operações pela chave cpf_cnpj_cedente (LEFT JOIN).
+
+    Com documentos únicos na dimensão, a busca é feita apenas sobre os
+    valores distintos da chave (categorias) e os códigos são propagados às
+    linhas, sem percorrer as operações. Documentos repetidos na dimensão
+    caem em um merge comum, que duplica as operações como o JOIN do banco.
+
+    Args:
+        facts (pandas.DataFrame): Operações com a coluna cpf_cnpj_cedente
+        dimension (pandas.DataFrame): Resultado de fetch_dimension
+        keep_key (bool, optional): Mantém a coluna cpf_cnpj_cedente
+
+    Returns:
+        pandas.DataFrame: Operações com as colunas de BASE_QUERY (e a chave,
+            se keep_key)
+    """
+    dimension = dimension.dropna(subset=['cpf_cnpj'])
+    facts = facts.drop(columns=['gerente'], errors='ignore')
+
+    keys = facts[FACT_KEY]
+    if not isinstance(keys.dtype, pd.CategoricalDtype):
+        keys = keys.astype('category')
+
+    if dimension['cpf_cnpj'].is_unique:
+        lookup = pd.Series(dimension['gerente'].to_numpy(), index=dimension['cpf_cnpj'].to_numpy())
+        per_key = pd.Categorical(lookup.reindex(keys.cat.categories).to_numpy())
+        codes = np.append(per_key.codes, -1)[keys.cat.codes.to_numpy()]
+        facts = facts.assign(gerente=pd.Categorical.from_codes(codes, categories=per_key.categories))
+    else:
+        dimension = dimension.rename(columns={'cpf_cnpj': FACT_KEY})
+        facts = facts.assign(**{FACT_KEY: keys.astype(object)}).merge(dimension, on=FACT_KEY, how='left')
+        facts = compact_dataframe(facts, FACT_SCHEMA)
+
+    columns = list(OPERATIONS_SCHEMA) + ([FACT_KEY] if keep_key else [])
+    return facts[[column for column in columns if column in facts.columns]]
+
+def _gerente_keys(dimension, gerentes=None, user_group=None):
+    """
+    Documentos dos cedentes que atendem aos filtros de gerente (mesma regra
+    de build_operations_query), ou None se não houver filtro de gerente.
+    """
+    filters = []
+    if gerentes:
+        filters.append(gerentes)
+    if user_group is not None and user_group != "ADM":
+        filters.append([user_group])
+    if not filters:
+        return None
+
+    names = dimension['gerente'].astype(object)
+    normalized_names = names.str.strip().str.upper()
+    mask = np.ones(len(dimension), dtype=bool)
+    for display_names in filters:
+        normalized, literal = gerente_raw_names(display_names)
+        mask &= (normalized_names.isin(normalized) | names.isin(literal)).to_numpy()
+
+    return dimension.loc[mask, 'cpf_cnpj'].dropna().unique().tolist()
+
+def partition_dates(start_date, end_date, partitions):
+    """Divide o período [start_date, end_date] em até partitions intervalos de dias inteiros."""
+    total_days = (end_date - start_date).days + 1
+    partitions = max(1, min(partitions, total_days))
+    bounds = np.linspace(0, total_days, partitions + 1).round().astype(int)
+    return [
+        (start_date + timedelta(days=int(first)), start_date + timedelta(days=int(last) - 1))
+        for first, last in zip(bounds[:-1], bounds[1:])
+    ]
+
+@traced()
+def fetch_data_partitioned(engine, partitions=None, chunksize=None,
+                           keep_key=False, dimension=None, start_date=None, end_date=None,
+                           missing_date=False, gerentes=None, user_group=None, **filters):
+    """
+    Carrega as operações em consultas paralelas por período, sem JOIN no banco.
+
+    A dimensão de cedentes vem de fetch_dimension (em memória); as operações
+    são lidas em partições de datas, cada uma em uma conexão do pool e em
+    uma thread, e o gerente é acrescentado por join_gerentes. Filtros de
+    gerente (e a restrição por grupo) viram uma lista de documentos de
+    cedentes. O resultado é o mesmo de fetch_data com uma única consulta.
+
+    Args:
+        engine: Engine do SQLAlchemy
+        partitions (int, optional): Número de consultas paralelas (padrão:
+            get_fetch_partitions)
+        chunksize (int, optional): Linhas por bloco em cada consulta (padrão:
+            get_fetch_chunksize)
+        keep_key (bool, optional): Mantém a coluna cpf_cnpj_cedente
+        dimension (pandas.DataFrame, optional): Dimensão já carregada
+        **filters: Filtros aceitos por build_operations_query
+
+    Returns:
+        pandas.DataFrame: Operações compactadas
+    """
+    dimension = dimension if dimension is not None else fetch_dimension(engine)
+    chunksize = chunksize or get_fetch_chunksize()
+    partitions = partitions or get_fetch_partitions()
+
+    cpf_cnpjs = _gerente_keys(dimension, gerentes, user_group)
+    columns = list(OPERATIONS_SCHEMA) + ([FACT_KEY] if keep_key else [])
+    if cpf_cnpjs is not None and not cpf_cnpjs:
+        return compact_dataframe(pd.DataFrame(columns=columns))
+
+    # Período a dividir: o dos filtros ou o da tabela inteira
+    first, last = start_date, end_date
+    if not missing_date and (first is None or last is None):
+        with engine.connect() as conn:
+            bounds = pd.read_sql(text(DATE_BOUNDS_QUERY), conn).iloc[0]
+        if first is None and pd.notna(bounds['data_min']):
+            first = pd.Timestamp(bounds['data_min']).date()
+        if last is None and pd.notna(bounds['data_max']):
+            last = pd.Timestamp(bounds['data_max']).date()
+
+    queries = []
+    if not missing_date and first is not None and last is not None and first <= last:
+        for part_start, part_end in partition_dates(first, last, partitions):
+            queries.append(build_operations_query(
+                start_date=part_start, end_date=part_end, cpf_cnpjs=cpf_cnpjs,
+                base_query=FACT_QUERY, **filters
+            ))
+    # Sem filtro de período a consulta única também traz as operações sem data
+    if missing_date or (start_date is None and end_date is None):
+        queries.append(build_operations_query(
+            missing_date=True, cpf_cnpjs=cpf_cnpjs, base_query=FACT_QUERY, **filters
+        ))
+
+    with ThreadPoolExecutor(max_workers=max(1, len(queries)), thread_name_prefix="fetch") as executor:
+        parts = list(executor.map(
+            lambda query: _read_chunks(engine, query[0], query[1], chunksize, FACT_SCHEMA), queries
+        ))
+
+    chunks = [chunk for part in parts for chunk in part]
+    if not chunks:
+        return compact_dataframe(pd.DataFrame(columns=columns))
+
+    facts = concat_compact(chunks, FACT_SCHEMA)
+    return join_gerentes(facts, dimension, keep_key)
+
+def fetch_filter_options(engine, user_group=None):
+    """
+    Retorna as combinações distintas de cedente, gerente e etapa, com o
+    período de cada uma, para montar os filtros sem carregar as operações.
+
+    Args:
+        engine: Engine do SQLAlchemy
+        user_group (str, optional): Grupo do usuário (segurança por linha)
+    """
+    query, params = build_operations_query(
+        user_group=user_group,
+        base_query=OPTIONS_QUERY,
+        suffix="    GROUP BY f.cedente, d.gerente, f.etapa\n"
+    )
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params=params)
+
+    for column in ['data_min', 'data_max']:
+        df[column] = pd.to_datetime(df[column], errors='coerce')
 
     return df
 
+def gerente_display_expression():
+    """
+    Expressão SQL equivalente a data_processing.rename_gerente.
+
+    Returns:
+        tuple: (expressão CASE, dict de parâmetros)
+    """
+    cases = []
+    params = {}
+    for i, (raw, display) in enumerate(get_gerente_mapping().items()):
+        cases.append(f"WHEN :gerente_de_{i} THEN :gerente_para_{i}")
+        params[f'gerente_de_{i}'] = raw
+        params[f'gerente_para_{i}'] = display
+
+    expression = f"CASE UPPER(TRIM(d.gerente)) {' '.join(cases)} ELSE d.gerente END"
+    return expression, params
+
+@traced()
+def fetch_aggregated_data(engine, with_cells=False, **filters):
+    """
+    Agrupa as operações no PostgreSQL, transferindo apenas as linhas agrupadas.
+
+    Produz o mesmo resultado de data_processing.aggregate_data aplicado às
+    operações filtradas, com os gerentes já renomeados.
+
+    Args:
+        engine: Engine do SQLAlchemy
+        with_cells (bool, optional): Retorna também as células agrupadas
+            inclusive as de chave nula (base dos gráficos, ver
+            comissao.chart_data)
+        **filters: Filtros aceitos por build_operations_query
+
+    Returns:
+        tuple: (df_grouped numérico, (total_desagio, total_valor_operado, prazo_medio_geral))
+            e, com with_cells, as células
+    """
+    gerente_expression, gerente_params = gerente_display_expression()
+    base_query = f"""
+    SELECT 
+        f.cedente,
+        {gerente_expression} AS gerente,
+        f.etapa, 
+        MAX(f.data) AS data, 
+        SUM(f.valor_desagio) AS valor_desagio, 
+        SUM(f.valor_bruto) AS valor_bruto, 
+        AVG(f.prazo_medio) AS prazo_medio, 
+        SUM(f.prazo_medio * f.valor_bruto) AS prazo_ponderado 
+    FROM fato_operacoes f
+    LEFT JOIN dimcedentesconsolidado d 
+        ON f.cpf_cnpj_cedente = d.cpf_cnpj
+    """
+    query, params = build_operations_query(
+        base_query=base_query,
+        suffix="    GROUP BY 1, 2, 3\n",
+        **filters
+    )
+    params.update(gerente_params)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params=params)
+
+    df['data'] = pd.to_datetime(df['data'], errors='coerce')
+
+    # Totais sobre todas as linhas, inclusive as sem cedente/gerente/etapa
+    total_desagio = df['valor_desagio'].sum()
+    total_valor_operado = df['valor_bruto'].sum()
+    prazo_medio_geral = 0
+    if total_valor_operado > 0:
+        prazo_medio_geral = df['prazo_ponderado'].sum() / total_valor_operado
+
+    # Como no groupby do pandas, grupos com chave nula ficam fora da tabela
+    group_cols = ['cedente', 'gerente', 'etapa']
+    df_grouped = (
+        df.dropna(subset=group_cols)
+        .drop(columns='prazo_ponderado')
+        .sort_values(group_cols)
+        .reset_index(drop=True)
+    )
+
+    totals = (total_desagio, total_valor_operado, prazo_medio_geral)
+    return (df_grouped, totals, df) if with_cells else (df_grouped, totals)
+
 if __name__ == "__main__":
     engine = connect_to_database()
     df = fetch_data(engine)
     print(df.head())
+    print(memory_usage_report(df))
+    print(get_pool_stats(engine))
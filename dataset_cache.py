@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from data_processing import index_by_date
+from facet_index import get_facet_index
+
+# As configurações abaixo são lidas a cada uso (e não na importação), depois
+# do .env carregado por database.connect_to_database
+
+def get_dataset_cache_ttl():
+    """Validade de cada conjunto de dados em segundos (DATASET_CACHE_TTL, padrão 300)."""
+    return int(os.getenv("DATASET_CACHE_TTL", "300"))
+
+def get_dataset_cache_size():
+    """Número máximo de conjuntos de dados guardados (DATASET_CACHE_SIZE, padrão 16)."""
+    return int(os.getenv("DATASET_CACHE_SIZE", "16"))
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # chave -> {'loaded', 'df', 'bytes', 'views'}
+_loading = {}  # chave -> Lock da carga em andamento
+_stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'invalidations': 0}
+
+def _memory(df):
+    return int(df.memory_usage(deep=True).sum())
+
+def _key_lock(key):
+    with _lock:
+        return _loading.setdefault(key, threading.Lock())
+
+def get_dataset(key, loader, ttl=None):
+    """
+    Retorna o conjunto de dados compartilhado por todas as sessões do processo.
+
+    Na primeira chamada (ou após expirar o ttl) loader é executado uma única
+    vez, mesmo com várias sessões pedindo a mesma chave ao mesmo tempo; as
+    demais aguardam e recebem o mesmo DataFrame. Se loader devolver o mesmo
+    objeto já guardado (ex.: cache local sem mudanças), as visões por grupo
+    são mantidas.
+
+    O DataFrame retornado é compartilhado e não deve ser alterado: loader
+    deve entregá-lo já preparado (ex.: gerentes renomeados e ordenado por
+    data), de modo que as etapas seguintes apenas leiam ou criem fatias.
+
+    Args:
+        key: Identificador do conjunto de dados (qualquer valor hashable)
+        loader (callable): Função sem argumentos que carrega o DataFrame
+        ttl (int, optional): Validade em segundos (padrão: get_dataset_cache_ttl())
+
+    Returns:
+        pandas.DataFrame: Conjunto de dados compartilhado
+    """
+    ttl = get_dataset_cache_ttl() if ttl is None else ttl
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and time.time() - entry['loaded'] <= ttl:
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return entry['df']
+
+    with _key_lock(key):
+        # Outra sessão pode ter carregado enquanto esta aguardava
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and time.time() - entry['loaded'] <= ttl:
+                _stats['hits'] += 1
+                return entry['df']
+            _stats['misses'] += 1
+
+        df = loader()
+
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and entry['df'] is df:
+                entry['loaded'] = time.time()
+                _stats['reloads'] += 1
+            else:
+                _entries[key] = {'loaded': time.time(), 'df': df, 'bytes': _memory(df), 'views': {}}
+            _entries.move_to_end(key)
+            while len(_entries) > get_dataset_cache_size():
+                evicted, _ = _entries.popitem(last=False)
+                _loading.pop(evicted, None)
+
+    return df
+
+def get_group_view(key, user_group, loader, ttl=None):
+    """
+    Retorna a parte do conjunto de dados visível para user_group.
+
+    Usuários ADM recebem o conjunto completo (sem cópia). Para os demais
+    grupos a fatia com as operações do próprio gerente é montada uma única
+    vez, a partir das posições do índice de facetas, e compartilhada pelas
+    sessões do mesmo grupo; o conjunto completo nunca é copiado.
+
+    Args:
+        key: Identificador do conjunto de dados (ver get_dataset)
+        user_group (str): Grupo do usuário logado
+        loader (callable): Função que carrega o conjunto completo
+        ttl (int, optional): Validade em segundos (padrão: get_dataset_cache_ttl())
+
+    Returns:
+        pandas.DataFrame: Operações visíveis para o grupo
+    """
+    df = get_dataset(key, loader, ttl)
+    if user_group is None or user_group == "ADM":
+        return df
+
+    with _lock:
+        entry = _entries.get(key)
+        views = entry['views'] if entry is not None and entry['df'] is df else {}
+        view = views.get(user_group)
+        if view is not None:
+            return view
+
+    gerentes = get_facet_index(df)['gerente']
+    code = gerentes['categories'].get_indexer([user_group])[0]
+    positions = gerentes['positions'][code] if code >= 0 else []
+
+    # Fatia própria do grupo, ordenada por data e com RangeIndex, pronta
+    # para os filtros de data_processing
+    view = df.iloc[positions].reset_index(drop=True)
+    view.attrs = {'gerentes_normalizados': df.attrs.get('gerentes_normalizados', False)}
+    view = index_by_date(view)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry['df'] is df:
+            if user_group not in entry['views']:
+                entry['views'][user_group] = view
+                entry['bytes'] += _memory(view)
+            view = entry['views'][user_group]
+
+    return view
+
+def invalidate(key=None):
+    """Descarta um conjunto de dados (ou todos, se key for None) e suas visões."""
+    with _lock:
+        if key is None:
+            _stats['invalidations'] += len(_entries)
+            _entries.clear()
+        elif _entries.pop(key, None) is not None:
+            _stats['invalidations'] += 1
+
+def cache_stats():
+    """Estatísticas do cache: acertos, cargas, entradas e memória ocupada."""
+    with _lock:
+        return {
+            **_stats,
+            'entries': len(_entries),
+            'views': sum(len(entry['views']) for entry in _entries.values()),
+            'bytes': sum(entry['bytes'] for entry in _entries.values()),
+        }
@@ -0,0 +1,146 @@
+import io
+import os
+import argparse
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+def get_export_chunksize():
+    """
+    Linhas convertidas por vez (EXPORT_CHUNKSIZE, padrão 100000): cada bloco
+    vira um trecho do CSV ou um row group do Parquet, o que limita a memória
+    usada durante a exportação.
+
+    Lido a cada exportação, depois do .env carregado por connect_to_database.
+    """
+    return int(os.getenv("EXPORT_CHUNKSIZE", "100000"))
+
+# Formatos de exportação: extensão e tipo MIME
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/octet-stream'),
+}
+
+class _StreamSink(io.RawIOBase):
+    """Destino do ParquetWriter que acumula apenas os bytes ainda não entregues."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+def iter_csv(df, chunksize=None):
+    """
+    Gera o CSV de df em blocos de bytes, no padrão brasileiro (separador
+    ';', vírgula decimal, datas dd/mm/aaaa e BOM UTF-8 para o Excel).
+
+    Args:
+        df (pandas.DataFrame): Dados a exportar
+        chunksize (int, optional): Linhas por bloco (padrão:
+            get_export_chunksize())
+
+    Yields:
+        bytes: Trechos consecutivos do arquivo
+    """
+    chunksize = chunksize or get_export_chunksize()
+    options = {'sep': ';', 'decimal': ',', 'date_format': '%d/%m/%Y', 'index': False}
+
+    yield df.iloc[:0].to_csv(**options).encode('utf-8-sig')
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize].to_csv(header=False, **options).encode('utf-8')
+
+def iter_parquet(df, chunksize=None):
+    """
+    Gera o Parquet de df em blocos de bytes, um row group por bloco de
+    linhas, mantendo os tipos (categorias, datas e números).
+
+    Args:
+        df (pandas.DataFrame): Dados a exportar
+        chunksize (int, optional): Linhas por row group (padrão:
+            get_export_chunksize())
+
+    Yields:
+        bytes: Trechos consecutivos do arquivo
+    """
+    chunksize = chunksize or get_export_chunksize()
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    sink = _StreamSink()
+
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, max(len(df), 1), chunksize):
+            chunk = df.iloc[start:start + chunksize]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+
+    yield sink.drain()
+
+EXPORTERS = {
+    'csv': iter_csv,
+    'parquet': iter_parquet,
+}
+
+def write_export(df, export_format, output=None, chunksize=None):
+    """
+    Grava a exportação de df em output bloco a bloco.
+
+    Args:
+        df (pandas.DataFrame): Dados a exportar
+        export_format (str): 'csv' ou 'parquet'
+        output (file, optional): Arquivo binário de destino. Se None, usa um
+            arquivo temporário em disco.
+        chunksize (int, optional): Linhas por bloco (padrão:
+            get_export_chunksize())
+
+    Returns:
+        file: output (ou o arquivo temporário), posicionado no início
+    """
+    output = output if output is not None else tempfile.TemporaryFile()
+    for data in EXPORTERS[export_format](df, chunksize):
+        output.write(data)
+
+    output.flush()
+    output.seek(0)
+    return output
+
+if __name__ == "__main__":
+    from datetime import date
+    from local_cache import load_cache
+    from data_processing import normalize_gerentes, index_by_date, slice_date_range, format_dataframes
+
+    parser = argparse.ArgumentParser(description="Exporta as operações do cache local em CSV ou Parquet.")
+    parser.add_argument("saida", help="arquivo de destino")
+    parser.add_argument("--formato", choices=sorted(EXPORTERS), default="csv")
+    parser.add_argument("--agrupado", action="store_true", help="exporta a tabela agrupada com totais")
+    parser.add_argument("--inicio", type=date.fromisoformat, metavar="AAAA-MM-DD")
+    parser.add_argument("--fim", type=date.fromisoformat, metavar="AAAA-MM-DD")
+    args = parser.parse_args()
+
+    df = load_cache()
+    if df is None:
+        parser.error("cache local não encontrado; execute python local_cache.py antes")
+
+    df = index_by_date(normalize_gerentes(df))
+    if args.inicio or args.fim:
+        df = slice_date_range(df, args.inicio or df.attrs['data_min'], args.fim or df.attrs['data_max'])
+    if args.agrupado:
+        df = format_dataframes(df, numeric=True)[1]
+
+    with open(args.saida, "wb") as file:
+        write_export(df, args.formato, file)
@@ -0,0 +1,172 @@
+import weakref
+import threading
+import numpy as np
+import pandas as pd
+
+# Colunas usadas nos filtros em cascata da barra lateral
+FACET_COLUMNS = ['cedente', 'gerente', 'etapa']
+
+# Índices já construídos, por conjunto de dados (id do DataFrame)
+_indexes = {}
+_lock = threading.Lock()
+
+def build_facet_index(df, columns=FACET_COLUMNS, value_column='valor_bruto'):
+    """
+    Constrói o índice de facetas de um conjunto de dados.
+
+    Para cada coluna de filtro guarda o código de cada linha e, para cada
+    valor distinto, o array ordenado das posições das linhas com esse valor.
+    Também guarda a contagem e o total de value_column por valor.
+
+    As posições se referem à ordem das linhas de df, que deve ter RangeIndex
+    (como após data_processing.index_by_date), de modo que os rótulos do
+    índice das fatias filtradas sejam as próprias posições.
+
+    Args:
+        df (pandas.DataFrame): Conjunto de dados completo
+        columns (list, optional): Colunas de filtro
+        value_column (str, optional): Coluna somada por opção
+
+    Returns:
+        dict: Índice por coluna ('categories', 'codes', 'positions',
+            'counts', 'totals') e os valores de value_column ('values')
+    """
+    values = None
+    if value_column in df.columns:
+        values = pd.to_numeric(df[value_column], errors='coerce').fillna(0).to_numpy(dtype='float64')
+
+    index = {'rows': len(df), 'values': values}
+
+    for column in columns:
+        if column not in df.columns:
+            continue
+
+        series = df[column]
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype('category')
+
+        categories = series.cat.categories
+        codes = series.cat.codes.to_numpy()
+        valid = codes >= 0
+
+        # Ordenação estável: as posições de cada valor ficam em ordem crescente
+        order = np.argsort(codes, kind='stable')
+        order = order[codes[order] >= 0]
+
+        counts = np.bincount(codes[valid], minlength=len(categories))
+        positions = np.split(order, np.cumsum(counts)[:-1]) if len(categories) else []
+
+        totals = None
+        if values is not None:
+            totals = np.bincount(codes[valid], weights=values[valid], minlength=len(categories))
+
+        index[column] = {
+            'categories': categories,
+            'codes': codes,
+            'positions': positions,
+            'counts': counts,
+            'totals': totals,
+        }
+
+    return index
+
+def get_facet_index(df, columns=FACET_COLUMNS):
+    """
+    Retorna o índice de facetas de df, construindo-o apenas na primeira vez
+    que o conjunto de dados é visto.
+    """
+    key = id(df)
+    with _lock:
+        entry = _indexes.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    # Construído fora do lock; outras sessões podem inserir ao mesmo tempo
+    index = build_facet_index(df, columns)
+
+    with _lock:
+        # Descartar índices de conjuntos de dados que já foram liberados
+        for stale in [k for k, (ref, _) in _indexes.items() if ref() is None]:
+            del _indexes[stale]
+
+        entry = _indexes.get(key)
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        _indexes[key] = (weakref.ref(df), index)
+    return index
+
+def _as_rows(labels, total_rows):
+    """Converte o índice de uma fatia em um range contíguo ou array de posições."""
+    if labels is None:
+        return range(0, total_rows)
+    if isinstance(labels, pd.RangeIndex) and labels.step == 1:
+        return range(labels.start, labels.stop)
+    return labels.to_numpy()
+
+def facet_options(index, column, labels=None):
+    """
+    Opções disponíveis de uma coluna de filtro entre as linhas atuais.
+
+    Args:
+        index (dict): Índice de build_facet_index
+        column (str): Coluna de filtro
+        labels (pandas.Index, optional): Índice do DataFrame já filtrado.
+            Se None, considera todas as linhas.
+
+    Returns:
+        pandas.DataFrame: Contagem de operações ('count') e total
+            ('valor_bruto') por opção, apenas para opções presentes
+    """
+    facet = index[column]
+    rows = _as_rows(labels, index['rows'])
+
+    if isinstance(rows, range) and rows.start == 0 and rows.stop == index['rows']:
+        counts, totals = facet['counts'], facet['totals']
+    else:
+        selector = slice(rows.start, rows.stop) if isinstance(rows, range) else rows
+        codes = facet['codes'][selector]
+        valid = codes >= 0
+        counts = np.bincount(codes[valid], minlength=len(facet['categories']))
+        totals = None
+        if index['values'] is not None:
+            totals = np.bincount(
+                codes[valid], weights=index['values'][selector][valid],
+                minlength=len(facet['categories'])
+            )
+
+    options = pd.DataFrame({'count': counts}, index=facet['categories'])
+    if totals is not None:
+        options['valor_bruto'] = totals
+
+    return options[options['count'] > 0]
+
+def facet_rows(index, column, selected_values, labels=None):
+    """
+    Posições das linhas com column em selected_values, dentre as linhas atuais.
+
+    Une as listas de posições dos valores selecionados e as intersecta com
+    as linhas atuais; para uma fatia contígua (filtro de período) a
+    intersecção é feita por busca binária em cada lista.
+
+    Returns:
+        numpy.ndarray: Posições ordenadas
+    """
+    facet = index[column]
+    rows = _as_rows(labels, index['rows'])
+    codes = facet['categories'].get_indexer(selected_values)
+
+    parts = []
+    for code in codes[codes >= 0]:
+        positions = facet['positions'][code]
+        if isinstance(rows, range):
+            positions = positions[positions.searchsorted(rows.start):positions.searchsorted(rows.stop)]
+        parts.append(positions)
+
+    if not parts:
+        return np.array([], dtype=np.intp)
+
+    result = np.sort(np.concatenate(parts))
+    if not isinstance(rows, range):
+        result = np.intersect1d(result, rows, assume_unique=True)
+
+    return result
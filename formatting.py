@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Conversão do formato en-US ("1,234.56") para pt-BR ("1.234,56"), sem
+# depender do locale do processo
+_PT_BR_TABLE = str.maketrans({',': '.', '.': ','})
+
+# Formatação de valores individuais
+def format_currency(value):
+    return f"R$ {value:,.2f}".translate(_PT_BR_TABLE)
+
+def format_decimal(value, digits=2):
+    return f"{value:.{digits}f}".translate(_PT_BR_TABLE)
+
+def format_short_date(date):
+    if pd.isna(date):
+        return ""
+    return date.strftime('%d/%m/%Y')
+
+# Formatação de colunas inteiras
+def _format_numbers(series, template, na_rep):
+    """
+    Formata uma coluna numérica com template (formato en-US) e converte
+    para pt-BR com uma única chamada a translate sobre a coluna inteira.
+    """
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    if len(values) == 0:
+        return pd.Series([], index=series.index, dtype=object)
+
+    joined = "\n".join([template.format(value) for value in values.tolist()])
+    result = np.array(joined.translate(_PT_BR_TABLE).split("\n"), dtype=object)
+    result[np.isnan(values)] = na_rep
+
+    return pd.Series(result, index=series.index, name=series.name)
+
+def format_currency_series(series, na_rep=""):
+    """Formata uma coluna como moeda brasileira (R$ 1.234,56)."""
+    return _format_numbers(series, "R$ {:,.2f}", na_rep)
+
+def format_decimal_series(series, digits=2, na_rep=""):
+    """Formata uma coluna como decimal com vírgula (12,34)."""
+    return _format_numbers(series, "{:.%df}" % digits, na_rep)
+
+def format_date_series(series, na_rep=""):
+    """Formata uma coluna de datas como dd/mm/aaaa."""
+    dates = pd.to_datetime(series, errors='coerce')
+    return dates.dt.strftime('%d/%m/%Y').fillna(na_rep).astype(object)
+
+# Formatação na renderização (valores permanecem numéricos)
+REPORT_FORMATTERS = {
+    'data': format_short_date,
+    'PRAZO MEDIO': lambda value: format_decimal(value, 2),
+    'DESAGIO': format_currency,
+    'VALOR OPERADO': format_currency,
+}
+
+def style_report_table(df):
+    """
+    Aplica a formatação pt-BR apenas na exibição da tabela.
+
+    Os valores continuam numéricos no DataFrame, de modo que a ordenação no
+    st.dataframe é feita sobre os números e nenhuma cópia em texto da tabela
+    é mantida.
+
+    Args:
+        df (pandas.DataFrame): Tabela agrupada em modo numérico
+
+    Returns:
+        pandas.io.formats.style.Styler: Tabela com formatadores de exibição
+    """
+    formatters = {col: fmt for col, fmt in REPORT_FORMATTERS.items() if col in df.columns}
+    return df.style.format(formatters, na_rep="")
+
+# Tabela paginada: ordenação e fatiamento no servidor
+def sort_report_rows(df, column, ascending=False):
+    """
+    Posições das linhas de df ordenadas pelos valores da coluna (números e
+    datas pelo valor, categorias pela ordem das categorias), com nulos no
+    final. A ordenação é estável: empates mantêm a ordem original.
+    """
+    values = df[column].reset_index(drop=True)
+    return values.sort_values(ascending=ascending, na_position='last', kind='mergesort').index.to_numpy()
+
+def page_report_table(df_grouped, totals_row, sort_column='VALOR OPERADO', ascending=False, page=1, page_size=50):
+    """
+    Página da tabela agrupada, ordenada pelos valores numéricos, com a linha
+    de totais fixada no final.
+
+    Apenas as linhas da página são copiadas; a tabela completa continua no
+    servidor. O índice traz a posição de cada linha na ordenação.
+
+    Args:
+        df_grouped (pandas.DataFrame): Tabela agrupada em modo numérico (sem totais)
+        totals_row (pandas.DataFrame): Linha de totais (create_totals_row)
+        sort_column (str, optional): Coluna de ordenação
+        ascending (bool, optional): Ordem crescente. Padrão: decrescente (maiores primeiro)
+        page (int, optional): Página (a partir de 1)
+        page_size (int, optional): Linhas por página
+
+    Returns:
+        pandas.DataFrame: Linhas da página seguidas da linha de totais
+    """
+    order = sort_report_rows(df_grouped, sort_column, ascending)
+    start = (max(page, 1) - 1) * page_size
+    positions = order[start:start + page_size]
+
+    page_rows = df_grouped.iloc[positions]
+    page_rows.index = [str(start + rank + 1) for rank in range(len(positions))]
+
+    totals_row = totals_row.copy()
+    totals_row.index = [""]
+    return pd.concat([page_rows, totals_row])
@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import threading
+import argparse
+from datetime import datetime, timedelta
+import pandas as pd
+import pyarrow.parquet as pq
+from database import (
+    connect_to_database, fetch_data, fetch_data_partitioned, fetch_dimension, join_gerentes,
+    concat_compact, get_fetch_partitions, FACT_KEY
+)
+from rollup import build_rollup, refresh_rollup
+from tracing import traced
+
+DATA_FILE = "fato_operacoes.parquet"
+META_FILE = "fato_operacoes.json"
+ROLLUP_FILE = "fato_operacoes_rollup.parquet"
+
+# As configurações abaixo são lidas a cada uso (e não na importação), depois
+# do .env carregado por database.connect_to_database
+
+def get_cache_dir():
+    """Diretório do cache local, Parquet + metadados (LOCAL_CACHE_DIR, padrão .cache)."""
+    return os.getenv("LOCAL_CACHE_DIR", ".cache")
+
+def get_sync_interval():
+    """
+    Intervalo mínimo, em segundos, entre duas consultas de delta ao banco
+    (LOCAL_CACHE_SYNC_INTERVAL, padrão 300).
+    """
+    return int(os.getenv("LOCAL_CACHE_SYNC_INTERVAL", "300"))
+
+_sync_lock = threading.Lock()
+
+# Último DataFrame lido por arquivo de cache (e colunas excluídas): (mtime, DataFrame)
+_loaded = {}
+
+def _data_path(cache_dir):
+    return os.path.join(cache_dir or get_cache_dir(), DATA_FILE)
+
+def _meta_path(cache_dir):
+    return os.path.join(cache_dir or get_cache_dir(), META_FILE)
+
+def _rollup_path(cache_dir):
+    return os.path.join(cache_dir or get_cache_dir(), ROLLUP_FILE)
+
+def read_metadata(cache_dir=None):
+    """Lê os metadados do cache local (marca d'água, última sincronização)."""
+    path = _meta_path(cache_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+def cache_age(cache_dir=None):
+    """Segundos desde a última sincronização do cache (infinito se nunca sincronizado)."""
+    last_sync = read_metadata(cache_dir).get('last_sync')
+    if last_sync is None:
+        return float('inf')
+    return time.time() - datetime.fromisoformat(last_sync).timestamp()
+
+def _read_parquet(path, reuse, exclude=()):
+    """
+    Lê um arquivo Parquet do cache, reutilizando o DataFrame já lido
+    enquanto o arquivo não mudar, de modo que índices construídos sobre ele
+    (datas, facetas) valham entre reruns. As colunas em exclude não são lidas.
+    """
+    if not os.path.exists(path):
+        return None
+
+    mtime = os.path.getmtime(path)
+    loaded = _loaded.get((path, exclude))
+    if reuse and loaded is not None and loaded[0] == mtime:
+        return loaded[1]
+
+    columns = None
+    if exclude:
+        columns = [name for name in pq.read_schema(path).names if name not in exclude]
+    df = pd.read_parquet(path, columns=columns)
+    if reuse:
+        _loaded[(path, exclude)] = (mtime, df)
+    return df
+
+def load_cache(cache_dir=None, reuse=True, with_key=False):
+    """
+    Carrega o cache local de operações.
+
+    Args:
+        cache_dir (str, optional): Diretório do cache (padrão: get_cache_dir()).
+        reuse (bool, optional): Reutiliza o DataFrame já lido enquanto o
+            arquivo não mudar.
+        with_key (bool, optional): Inclui a coluna cpf_cnpj_cedente (gravada
+            apenas nas cargas em partições, para refazer o gerente quando a
+            dimensão muda).
+
+    Returns:
+        pandas.DataFrame or None: Dados em cache, ou None se o cache não existir
+    """
+    return _read_parquet(_data_path(cache_dir), reuse, exclude=() if with_key else (FACT_KEY,))
+
+def load_rollup(cache_dir=None, reuse=True):
+    """
+    Carrega o cubo diário (rollup.build_rollup) gravado junto com o cache.
+
+    Caches gravados antes da existência do cubo têm o cubo construído a
+    partir dos dados na primeira leitura.
+
+    Args:
+        cache_dir (str, optional): Diretório do cache (padrão: get_cache_dir()).
+        reuse (bool, optional): Reutiliza o DataFrame já lido enquanto o
+            arquivo não mudar.
+
+    Returns:
+        pandas.DataFrame or None: Cubo, ou None se o cache não existir
+    """
+    path = _rollup_path(cache_dir)
+    if not os.path.exists(path):
+        with _sync_lock:
+            if not os.path.exists(path):
+                df = load_cache(cache_dir, reuse=False)
+                if df is None:
+                    return None
+                _write_parquet(build_rollup(df), path)
+
+    return _read_parquet(path, reuse)
+
+def _write_parquet(df, path):
+    """Grava um arquivo Parquet de forma atômica (arquivo temporário + rename)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+def _write_cache(df, rollup, metadata, cache_dir):
+    """Grava cubo, dados e metadados de forma atômica."""
+    _write_parquet(rollup, _rollup_path(cache_dir))
+    _write_parquet(df, _data_path(cache_dir))
+
+    meta_path = _meta_path(cache_dir)
+    with open(meta_path + ".tmp", "w") as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+def sync_operations(engine, reconcile_days=0, full=False, cache_dir=None):
+    """
+    Sincroniza o cache local com a tabela fato_operacoes.
+
+    Busca apenas as operações com data a partir da marca d'água gravada na
+    última sincronização, além das operações sem data. As linhas do cache
+    nesse intervalo (e as sem data) são substituídas pelas do banco, de modo
+    que operações incluídas no mesmo dia da marca d'água não se percam. O
+    cubo diário é atualizado da mesma forma: apenas os dias a partir do
+    início do delta são reconstruídos.
+
+    Com FETCH_PARTITIONS > 1 as operações são gravadas com a chave do
+    cedente (cpf_cnpj_cedente) e o gerente de todas as linhas é refeito a
+    partir da dimensão atual a cada sincronização, de modo que mudanças na
+    dimensão não exigem recarregar o histórico; nesse caso o cubo é
+    reconstruído a partir das operações em cache.
+
+    Args:
+        engine: Engine do SQLAlchemy
+        reconcile_days (int, optional): Modo de reconciliação. Recua a janela
+            de busca esse número de dias antes da marca d'água para capturar
+            operações lançadas com atraso ou corrigidas.
+        full (bool, optional): Ignora o cache e recarrega todo o histórico.
+        cache_dir (str, optional): Diretório do cache (padrão: get_cache_dir()).
+
+    Returns:
+        pandas.DataFrame: Dados completos após a sincronização
+    """
+    with _sync_lock:
+        metadata = read_metadata(cache_dir)
+        # Lido direto do arquivo: o DataFrame reutilizado por load_cache pode
+        # ter sido alterado pela página (ex.: gerentes renomeados)
+        cached = None if full else load_cache(cache_dir, reuse=False, with_key=True)
+        watermark = metadata.get('watermark')
+
+        # Carga em partições: dimensão em memória e chave gravada no cache
+        dimension = fetch_dimension(engine) if get_fetch_partitions() > 1 else None
+
+        def fetch(**filters):
+            if dimension is None:
+                return fetch_data(engine, **filters)
+            return fetch_data_partitioned(engine, keep_key=True, dimension=dimension, **filters)
+
+        dimension_changed = dimension is not None and (
+            metadata.get('dimension_version') != dimension.attrs['versao']
+        )
+
+        if cached is None or watermark is None:
+            df = fetch()
+            rollup = build_rollup(df)
+            mode = 'full'
+            delta_rows = len(df)
+        else:
+            since = (pd.Timestamp(watermark) - timedelta(days=reconcile_days)).normalize()
+            # Operações sem data não entram na marca d'água: são buscadas de
+            # novo a cada sincronização e substituem as do cache
+            delta = concat_compact([fetch(start_date=since.date()), fetch(missing_date=True)])
+            kept = cached[cached['data'].notna() & (cached['data'] < since)]
+            df = concat_compact([kept, delta])
+
+            # Dimensão alterada: gerente refeito em todas as linhas, sem recarga
+            if dimension_changed and FACT_KEY in df.columns:
+                df = join_gerentes(df, dimension, keep_key=True)
+
+            cached_rollup = _read_parquet(_rollup_path(cache_dir), reuse=False)
+            if cached_rollup is None or dimension_changed:
+                rollup = build_rollup(df)
+            else:
+                rollup = refresh_rollup(cached_rollup, delta, since)
+            mode = 'reconcile' if reconcile_days else 'delta'
+            delta_rows = len(delta)
+
+        # Gravar ordenado por data: index_by_date fica barato na leitura
+        df = df.sort_values('data', kind='mergesort', na_position='last', ignore_index=True)
+
+        max_date = df['data'].max()
+        metadata = {
+            'watermark': max_date.isoformat() if pd.notna(max_date) else watermark,
+            'last_sync': datetime.now().isoformat(),
+            'last_sync_mode': mode,
+            'last_delta_rows': delta_rows,
+            'rows': len(df),
+            'rollup_rows': len(rollup),
+        }
+        if dimension is not None:
+            metadata['dimension_version'] = dimension.attrs['versao']
+        _write_cache(df, rollup, metadata, cache_dir)
+
+    return df.drop(columns=[FACT_KEY], errors='ignore')
+
+@traced()
+def load_operations(engine, max_age=None, cache_dir=None):
+    """
+    Carrega as operações a partir do cache local, sincronizando o delta com
+    o banco somente se a última sincronização for mais antiga que max_age.
+
+    Args:
+        engine: Engine do SQLAlchemy
+        max_age (int, optional): Idade máxima do cache em segundos (padrão:
+            get_sync_interval()).
+        cache_dir (str, optional): Diretório do cache (padrão: get_cache_dir()).
+
+    Returns:
+        pandas.DataFrame: Dados de operações
+    """
+    if cache_age(cache_dir) < (get_sync_interval() if max_age is None else max_age):
+        cached = load_cache(cache_dir)
+        if cached is not None:
+            return cached
+
+    return sync_operations(engine, cache_dir=cache_dir)
+
+def ensure_synced(engine, max_age=None, cache_dir=None):
+    """
+    Sincroniza o cache local com o banco se a última sincronização for mais
+    antiga que max_age (ou se o cache não existir), sem montar o DataFrame
+    quando o cache está em dia. Usado quando as operações são lidas dos
+    arquivos do cache por outro motor (ex.: DuckDB).
+
+    Args:
+        engine: Engine do SQLAlchemy
+        max_age (int, optional): Idade máxima do cache em segundos (padrão:
+            get_sync_interval()).
+        cache_dir (str, optional): Diretório do cache (padrão: get_cache_dir()).
+
+    Returns:
+        bool: True se o cache foi sincronizado nesta chamada
+    """
+    max_age = get_sync_interval() if max_age is None else max_age
+    if cache_age(cache_dir) < max_age and os.path.exists(_data_path(cache_dir)):
+        return False
+    sync_operations(engine, cache_dir=cache_dir)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincroniza o cache local de fato_operacoes.")
+    parser.add_argument("--reconcile", type=int, default=0, metavar="DIAS",
+                        help="recua a janela de sincronização DIAS dias antes da marca d'água")
+    parser.add_argument("--full", action="store_true", help="recarrega todo o histórico")
+    args = parser.parse_args()
+
+    df = sync_operations(connect_to_database(), reconcile_days=args.reconcile, full=args.full)
+    print(read_metadata())
@@ -1,17 +1,39 @@
 import streamlit as st
 from authentication import setup_authentication
-from database import connect_to_database, fetch_data
-from data_processing import process_data, format_dataframes, rename_gerente
-from pdf_generator import generate_pdf_report
-from comissao import create_visualizations  # Corrigido para o arquivo correto
+from database import connect_to_database, fetch_data, fetch_filter_options, fetch_aggregated_data
+from local_cache import get_sync_interval, load_operations, ensure_synced, load_rollup, read_metadata
+from snapshot import get_snapshot_max_age, load_snapshot, snapshot_age
+from rollup import filter_rollup, aggregate_rollup, stream_aggregated_data
+from query_backend import (
+    get_report_backend, get_duckdb_source, duckdb_cache_dir, duckdb_source_version,
+    duckdb_filter_options, duckdb_aggregated_data, duckdb_operations
+)
+from prefix_index import EVOLUTION_FREQUENCIES, get_prefix_index, selection_totals, selection_evolution
+from data_processing import process_data, select_filters, format_dataframes, format_aggregated_data, normalize_gerentes, index_by_date
+from dataset_cache import get_dataset, get_group_view, invalidate, cache_stats
+from pdf_cache import report_key, get_cached_pdf, get_pending_pdf, request_pdf, pdf_cache_stats
+from formatting import style_report_table, page_report_table
+from export import EXPORT_FORMATS, write_export
+from comissao import create_visualizations, cached_chart_data  # Corrigido para o arquivo correto
+from tracing import start_trace, finish_trace, span, stage_percentiles
+import os
+import pandas as pd
 import base64
 from datetime import datetime
 
 # Configuração da página
 st.set_page_config(page_title="Relatório de Comissionamento", layout="wide")
 
+@st.cache_data(ttl=300, show_spinner=False)
+def load_filter_options(_conn, user_group):
+    return normalize_gerentes(fetch_filter_options(_conn, user_group=user_group))
+
+# Medição das etapas desta execução (log JSON e painel de desempenho)
+start_trace(page="Comissionamento")
+
 # Setup de autenticação
-auth_status, name, username, user_group = setup_authentication()
+with span('setup_authentication'):
+    auth_status, name, username, user_group = setup_authentication()
 
 # Verifica status de autenticação
 if not auth_status:
@@ -25,46 +47,268 @@ connection_status = st.empty()
 
 try:
     connection_status.info("Conectando ao banco de dados...")
-    conn = connect_to_database()
+    with span('connect_to_database'):
+        conn = connect_to_database()
     connection_status.success("✅ Conexão bem-sucedida!")
 
-    with st.spinner('Carregando dados...'):
-        df = fetch_data(conn)
+    # Origem dos dados (lida após connect_to_database, que carrega o .env):
+    # "cache" (cópia local em Parquet, filtros em pandas) ou "database"
+    # (filtros e segurança por linha aplicados na consulta SQL)
+    data_source = os.getenv("REPORT_DATA_SOURCE", "cache")
+    # Com REPORT_AGGREGATION=database (e origem "database") o agrupamento
+    # também é feito no banco e apenas as linhas agrupadas são transferidas;
+    # com "streaming" as operações são lidas em blocos por cursor no servidor
+    # e acumuladas por grupo, sem montar a tabela de detalhe
+    aggregation = os.getenv("REPORT_AGGREGATION", "pandas")
+    # Com REPORT_BACKEND=duckdb (origem "cache") filtros e agrupamento são
+    # feitos em SQL no DuckDB
+    report_backend = get_report_backend()
+    aggregators = {"database": fetch_aggregated_data, "streaming": stream_aggregated_data}
+    pre_aggregated = (
+        (data_source == "database" and aggregation in aggregators)
+        or (data_source != "database" and report_backend == "duckdb")
+    )
+
+    # Cubo diário filtrado (origem "cache"): responde tabela, totais e gráficos
+    rollup = None
+    prefix_index = None
+    # Células agrupadas com chaves nulas (origens já agrupadas): base dos gráficos
+    chart_cells = None
+    snapshot = None
+
+    # Dados compartilhados entre as sessões: estatísticas e recarga (ADM).
+    # A recarga descarta os conjuntos e resultados em cache e busca os dados
+    # de novo na origem (o cache local é sincronizado com o banco na hora;
+    # com snapshot, é usada a versão mais recente gravada por snapshot.py)
+    reload_data = False
+    if user_group == "ADM":
+        cache_panel = st.sidebar.expander("Cache de dados")
+        if cache_panel.button("Recarregar dados"):
+            invalidate()
+            load_filter_options.clear()
+            cached_chart_data.clear()
+            reload_data = True
+        cache_panel.json(cache_stats())
+        cache_panel.caption("Relatórios PDF")
+        cache_panel.json(pdf_cache_stats())
+
+    if data_source == "database":
+        # Filtros e segurança por linha aplicados no banco
+        selection = select_filters(load_filter_options(conn, user_group))
+
+        if aggregation in aggregators:
+            with st.spinner('Carregando dados...'):
+                df_aggregated, totals, chart_cells = aggregators[aggregation](
+                    conn, user_group=user_group, with_cells=True, **selection
+                )
+
+            # Gráficos e PDF passam a usar as linhas agrupadas (já numéricas)
+            df_filtered = df_aggregated
+        else:
+            # Sessões com o mesmo grupo e filtros compartilham o resultado
+            with st.spinner('Carregando dados...'):
+                df_filtered = get_dataset(
+                    ('database', report_key(user_group, selection)),
+                    lambda: normalize_gerentes(fetch_data(conn, user_group=user_group, **selection))
+                )
+    elif report_backend == "duckdb":
+        # Filtros e agrupamento compilados para SQL no DuckDB, sobre o cache
+        # local em Parquet ou um arquivo .duckdb (DUCKDB_SOURCE)
+        duckdb_source = get_duckdb_source()
+        cache_dir = duckdb_cache_dir(duckdb_source)
+        if cache_dir is not None:
+            # Cache local sincronizado com o banco como no backend pandas
+            # (delta a cada LOCAL_CACHE_SYNC_INTERVAL, na hora com "Recarregar dados")
+            with st.spinner('Sincronizando dados...'):
+                ensure_synced(conn, max_age=0 if reload_data else get_sync_interval(), cache_dir=cache_dir)
+
+        source_version = duckdb_source_version(duckdb_source)
+        if source_version is None:
+            connection_status.error(
+                f"❌ Origem do DuckDB não encontrada: {duckdb_source}. "
+                "Gere o arquivo com `python query_backend.py carregar` ou ajuste DUCKDB_SOURCE."
+            )
+            st.stop()
+        if cache_dir is None:
+            # Arquivo .duckdb gerado fora da página: não é atualizado aqui
+            st.sidebar.caption(
+                f"Dados de {datetime.fromisoformat(source_version):%d/%m/%Y %H:%M} ({duckdb_source})"
+            )
+
+        selection = select_filters(duckdb_filter_options(user_group))
+
+        with st.spinner('Carregando dados...'):
+            df_aggregated, totals, chart_cells = duckdb_aggregated_data(
+                user_group=user_group, with_cells=True, **selection
+            )
+        df_filtered = df_aggregated
+    else:
+        # Snapshot mais recente (snapshot.py), mapeado em memória: já vem com
+        # gerentes renomeados, ordenado por data e com o cubo diário
+        snapshot = load_snapshot()
+        if snapshot is not None:
+            metadata = snapshot['metadata']
+            age = snapshot_age(metadata)
+            freshness = (
+                f"Dados de {datetime.fromisoformat(metadata['criado_em']):%d/%m/%Y %H:%M} "
+                f"(há {int(age // 60)} min): {metadata['rows']} operações"
+            )
+            if metadata.get('data_max'):
+                freshness += f" até {datetime.fromisoformat(metadata['data_max']):%d/%m/%Y}"
+            if age > get_snapshot_max_age():
+                st.sidebar.warning(f"{freshness}. Snapshot desatualizado.")
+            else:
+                st.sidebar.caption(freshness)
 
-    # Aplicar renomeação dos gerentes antes de qualquer filtragem
-    if 'gerente' in df.columns:
-        df['gerente'] = df['gerente'].apply(rename_gerente)
+            dataset_key = ('snapshot', metadata['versao'])
+            loader = lambda: snapshot['operacoes']
+        else:
+            dataset_key = 'operacoes'
+            max_age = 0 if reload_data else get_sync_interval()
+            loader = lambda: index_by_date(normalize_gerentes(load_operations(conn, max_age=max_age)))
 
-    # Aplicar os filtros laterais primeiro
-    df_filtered = process_data(df)
+        # Conjunto carregado uma vez por processo e compartilhado entre as
+        # sessões, com gerentes renomeados e ordenado por data antes de
+        # qualquer filtragem. Usuários não ADM recebem apenas a fatia do
+        # próprio gerente (montada uma vez por grupo)
+        with st.spinner('Carregando dados...'), span('carregar_dados') as record:
+            df = get_group_view(dataset_key, user_group, loader)
+            record['rows_out'] = len(df)
 
-    # Filtrar dados pelo gerente logado
-    if user_group != "ADM":
-        df_filtered = df_filtered[df_filtered["gerente"] == user_group]  # Apenas dados do próprio gerente
+        # Aplicar os filtros laterais
+        selection = {}
+        df_filtered = process_data(df, selection)
+
+        # Mesma seleção (e restrição por gerente) aplicada ao cubo diário
+        cube = snapshot['rollup'] if snapshot is not None else load_rollup()
+        if cube is not None:
+            cube = normalize_gerentes(cube)
+            rollup = filter_rollup(cube, selection, user_group)
+            prefix_index = get_prefix_index(cube)
 
     # Processar e formatar dados usando a função de data_processing.py
-    df_grouped, df_grouped_with_totals, summary_stats = format_dataframes(df_filtered)
+    if pre_aggregated:
+        df_grouped, df_grouped_with_totals, summary_stats = format_aggregated_data(df_aggregated, totals, numeric=True)
+    elif rollup is not None:
+        # Totais do período a partir das somas acumuladas por dia, quando a
+        # seleção permite (sem filtro de etapa)
+        totals = selection_totals(prefix_index, selection, user_group)
+        df_grouped, df_grouped_with_totals, summary_stats = format_aggregated_data(
+            *aggregate_rollup(rollup, totals), numeric=True
+        )
+    else:
+        df_grouped, df_grouped_with_totals, summary_stats = format_dataframes(df_filtered, numeric=True)
 
     st.write(f"Total de cedentes: {len(df_grouped)} (de {df_filtered['cedente'].nunique()} cedentes filtrados)")
 
-    # Exibir a tabela
-    st.dataframe(df_grouped_with_totals)
+    # Exibir a tabela paginada: ordenação sobre os valores numéricos feita no
+    # servidor e apenas a página visível (com a linha de totais fixada)
+    # enviada ao navegador. Padrão: maiores valores operados primeiro
+    sort_columns = list(df_grouped.columns)
+    table_cols = st.columns([2, 1, 1, 1])
+    sort_column = table_cols[0].selectbox(
+        "Ordenar por", sort_columns,
+        index=sort_columns.index('VALOR OPERADO') if 'VALOR OPERADO' in sort_columns else 0
+    )
+    sort_order = table_cols[1].selectbox("Ordem", ["Decrescente", "Crescente"])
+    page_size = table_cols[2].selectbox("Linhas por página", [25, 50, 100, 500], index=1)
+    page_count = max(1, -(-len(df_grouped) // page_size))
+    page = table_cols[3].number_input("Página", min_value=1, max_value=page_count, value=1, step=1)
 
-    # Gerar PDF utilizando a função do pdf_generator.py
-    pdf_buffer = generate_pdf_report(df_filtered)
+    with span('tabela', len(df_grouped_with_totals)):
+        table_page = page_report_table(
+            df_grouped, df_grouped_with_totals.iloc[-1:], sort_column,
+            ascending=sort_order == "Crescente", page=int(page), page_size=page_size
+        )
+        st.dataframe(style_report_table(table_page))
+        st.caption(f"Página {int(page)} de {page_count} ({len(df_grouped)} linhas)")
 
-    # Adicionar um botão para download do PDF
-    pdf_file = pdf_buffer.getvalue()
+    # PDF gerado apenas quando solicitado, em segundo plano, e guardado em
+    # cache pela combinação de grupo do usuário, filtros e versão dos dados
+    full_pdf = st.checkbox("PDF completo (todas as linhas)")
+    if snapshot is not None:
+        data_version = snapshot['metadata']['versao']
+    elif data_source != "database" and report_backend == "duckdb":
+        data_version = source_version
+    else:
+        data_version = read_metadata().get('last_sync') if data_source != "database" else None
+    filter_state = {**selection, 'source': data_source, 'aggregation': aggregation}
+    pdf_key = report_key(user_group, {**filter_state, 'full': full_pdf}, data_version)
 
-    st.download_button(
-        label="Baixar Relatório PDF",
-        data=pdf_file,
-        file_name="relatorio_comissionamento.pdf",
-        mime="application/pdf"
-    )
+    pdf_file = get_cached_pdf(pdf_key)
+    if pdf_file is None:
+        pdf_future = get_pending_pdf(pdf_key)
+        if pdf_future is None and st.button("Gerar Relatório PDF"):
+            # Totais da tela: as linhas já agrupadas não permitem refazê-los
+            pdf_totals = (
+                summary_stats['total_desagio'], summary_stats['total_valor_operado'],
+                summary_stats['prazo_medio_geral'] or 0
+            )
+            pdf_future = request_pdf(pdf_key, df_filtered, full=full_pdf, totals=pdf_totals)
+
+        if pdf_future is not None:
+            with st.spinner('Gerando PDF...'), span('pdf', len(df_filtered)):
+                pdf_file = pdf_future.result()
+
+    if pdf_file is not None:
+        st.download_button(
+            label="Baixar Relatório PDF",
+            data=pdf_file,
+            file_name="relatorio_comissionamento.pdf",
+            mime="application/pdf"
+        )
+
+    # Exportação completa em CSV ou Parquet, gerada em blocos em um arquivo
+    # temporário apenas quando solicitada
+    export_sources = {"Tabela agrupada": ("agrupado", df_grouped_with_totals)}
+    if not pre_aggregated:
+        export_sources["Operações filtradas"] = ("operacoes", df_filtered)
+    elif data_source != "database":
+        # Detalhe lido do DuckDB apenas quando a exportação é solicitada
+        export_sources["Operações filtradas"] = (
+            "operacoes", lambda: duckdb_operations(user_group=user_group, **selection)
+        )
 
-    # Criar visualizações usando a função do comissao.py
-    create_visualizations(df_filtered)
+    export_cols = st.columns(2)
+    export_content = export_cols[0].selectbox("Exportar", list(export_sources))
+    export_format = export_cols[1].selectbox("Formato", list(EXPORT_FORMATS))
+
+    if st.button("Preparar exportação"):
+        export_name, df_export = export_sources[export_content]
+        extension, mime = EXPORT_FORMATS[export_format]
+        if callable(df_export):
+            df_export = df_export()
+        with st.spinner('Gerando arquivo...'), span('exportacao', len(df_export)):
+            export_file = write_export(df_export, export_format)
+
+        st.download_button(
+            label=f"Baixar {export_content} ({extension.upper()})",
+            data=export_file,
+            file_name=f"comissionamento_{export_name}.{extension}",
+            mime=mime
+        )
+
+    # Criar visualizações usando a função do comissao.py, a partir do cubo,
+    # das células agrupadas ou das operações filtradas, que mantêm as
+    # operações com gerente ou etapa nulos (a tabela agrupada não as tem);
+    # as séries ficam em cache pelo estado dos filtros
+    chart_key = report_key(user_group, filter_state, data_version)
+    if rollup is not None:
+        create_visualizations(rollup, 'valor_bruto', cache_key=chart_key)
+    elif chart_cells is not None:
+        create_visualizations(chart_cells, 'valor_bruto', cache_key=chart_key)
+    else:
+        create_visualizations(df_filtered, 'valor_bruto', cache_key=chart_key)
+
+    # Evolução do valor operado no período, por dia, semana ou mês
+    if prefix_index is not None:
+        st.subheader("Evolução do Valor Operado")
+        frequency = st.radio("Periodicidade", list(EVOLUTION_FREQUENCIES), horizontal=True)
+        with span('evolucao'):
+            evolution = selection_evolution(
+                prefix_index, rollup, selection, user_group, EVOLUTION_FREQUENCIES[frequency]
+            )
+        st.line_chart(evolution['valor_bruto'].rename('VALOR OPERADO'))
 
 except Exception as e:
     error_message = str(e)
@@ -78,3 +322,9 @@ except Exception as e:
         - Se a conta possui acesso ao banco de dados
         - Se o tipo de autenticação (ActiveDirectoryPassword) é apropriado para sua conta
         """)
+
+# Encerrar a medição; percentis recentes por etapa apenas para ADM
+finish_trace(user_group=user_group, data_source=os.getenv("REPORT_DATA_SOURCE", "cache"))
+if user_group == "ADM":
+    timing_panel = st.sidebar.expander("Desempenho (ms)")
+    timing_panel.dataframe(pd.DataFrame(stage_percentiles()))
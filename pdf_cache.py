@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from pdf_generator import generate_pdf_report, generate_full_pdf_report
+
+# As configurações abaixo são lidas a cada uso (e não na importação), depois
+# do .env carregado por database.connect_to_database
+
+def get_pdf_cache_size():
+    """Tamanho máximo do cache em número de relatórios (PDF_CACHE_SIZE, padrão 32)."""
+    return int(os.getenv("PDF_CACHE_SIZE", "32"))
+
+def get_pdf_cache_ttl():
+    """Validade de cada relatório em cache, em segundos (PDF_CACHE_TTL, padrão 900)."""
+    return int(os.getenv("PDF_CACHE_TTL", "900"))
+
+def get_pdf_workers():
+    """Threads de geração de PDF (PDF_WORKERS, padrão 2)."""
+    return int(os.getenv("PDF_WORKERS", "2"))
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # chave -> (momento da geração, bytes do PDF)
+_pending = {}  # chave -> Future
+
+# Os relatórios são gerados fora do script da página, em threads de fundo
+# (executor criado na primeira solicitação)
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=get_pdf_workers(), thread_name_prefix="pdf")
+    return _executor
+
+def report_key(user_group, selection, version=None):
+    """
+    Chave do relatório: hash do grupo do usuário, da seleção de filtros e
+    da versão dos dados (ex.: momento da última sincronização).
+    """
+    payload = json.dumps(
+        {'user_group': user_group, 'selection': selection, 'version': version},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get_cached_pdf(key):
+    """Retorna o PDF em cache para a chave, ou None."""
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+
+        created, pdf_file = entry
+        if time.time() - created > get_pdf_cache_ttl():
+            del _cache[key]
+            return None
+
+        _cache.move_to_end(key)
+        return pdf_file
+
+def _store(key, pdf_file):
+    with _lock:
+        _cache[key] = (time.time(), pdf_file)
+        _cache.move_to_end(key)
+        while len(_cache) > get_pdf_cache_size():
+            _cache.popitem(last=False)
+        _pending.pop(key, None)
+
+def _generate(key, df, filtered, full, totals):
+    try:
+        if full:
+            pdf_file = generate_full_pdf_report(df, BytesIO(), filtered, totals=totals).getvalue()
+        else:
+            pdf_file = generate_pdf_report(df, filtered).getvalue()
+    except Exception:
+        with _lock:
+            _pending.pop(key, None)
+        raise
+
+    _store(key, pdf_file)
+    return pdf_file
+
+def get_pending_pdf(key):
+    """Retorna a geração em andamento para a chave, ou None."""
+    with _lock:
+        return _pending.get(key)
+
+def request_pdf(key, df, filtered=False, full=False, totals=None):
+    """
+    Solicita a geração do PDF em segundo plano.
+
+    Se o relatório já estiver em cache ou sendo gerado, nenhuma nova geração
+    é iniciada.
+
+    Args:
+        key (str): Chave de report_key
+        df (pandas.DataFrame): Dados do relatório (não são alterados)
+        filtered (bool, optional): Indica se os dados estão filtrados
+        full (bool, optional): Gera o relatório completo (todas as linhas)
+        totals (tuple, optional): Totais das operações para a linha de totais
+            do relatório completo (ver pdf_generator.create_totals_row)
+
+    Returns:
+        concurrent.futures.Future: Resultado com os bytes do PDF
+    """
+    with _lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+
+        entry = _cache.get(key)
+        if entry is not None and time.time() - entry[0] <= get_pdf_cache_ttl():
+            future = Future()
+            future.set_result(entry[1])
+            return future
+
+        future = _get_executor().submit(_generate, key, df, filtered, full, totals)
+        _pending[key] = future
+        return future
+
+def pdf_cache_stats():
+    """Estatísticas do cache de PDFs."""
+    with _lock:
+        return {
+            'entries': len(_cache),
+            'pending': len(_pending),
+            'bytes': sum(len(pdf_file) for _, pdf_file in _cache.values()),
+        }
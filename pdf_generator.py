@@ -1,27 +1,18 @@
 import pandas as pd
-import locale
 from io import BytesIO
 from datetime import datetime
 from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-
-# Configura o locale para o Brasil
-try:
-    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-except:
-    try:
-        locale.setlocale(locale.LC_ALL, 'Portuguese_Brazil.1252')
-    except:
-        pass  # Se ambos falharem, usaremos formatação manual
+import formatting
 
 def format_currency(value):
     """Formata o valor monetário para o formato de moeda brasileira."""
     if pd.isna(value):
         return "R$ 0,00"
-    return locale.currency(value, grouping=True)
+    return formatting.format_currency(value)
 
 def create_document(buffer):
     """Cria o documento PDF com configurações padrão."""
@@ -34,8 +25,8 @@ def create_document(buffer):
         bottomMargin=0.5*inch
     )
 
-def add_header(elements, filtered=False):
-    """Adiciona o cabeçalho do relatório."""
+def add_header(elements, filtered=False, subtitle=None):
+    """Adiciona o cabeçalho do relatório (com uma linha de subtítulo opcional)."""
     styles = getSampleStyleSheet()
 
     # Título
@@ -43,6 +34,8 @@ def add_header(elements, filtered=False):
     if filtered:
         title += " (Filtrado)"
     elements.append(Paragraph(title, styles['Heading1']))
+    if subtitle:
+        elements.append(Paragraph(subtitle, styles['Heading3']))
     elements.append(Spacer(1, 12))
 
     # Data do relatório
@@ -52,18 +45,35 @@ def add_header(elements, filtered=False):
 
     return elements
 
+# Colunas de prazo (formatadas como decimal) e de valores (somadas no total)
+PRAZO_COLUMNS = ['prazo_medio', 'PRAZO MEDIO']
+VALUE_COLUMNS = {'valor_desagio': 'desagio', 'DESAGIO': 'desagio',
+                 'valor_bruto': 'valor', 'VALOR OPERADO': 'valor'}
+
+def format_table_rows(df):
+    """
+    Formata as linhas de um DataFrame para a tabela do PDF, coluna a coluna:
+    prazos como decimal, demais valores numéricos como moeda e datas como
+    dd/mm/aaaa.
+    """
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if col in PRAZO_COLUMNS and pd.api.types.is_numeric_dtype(values):
+            columns.append(formatting.format_decimal_series(values, 2))
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            columns.append(formatting.format_currency_series(values.fillna(0)))
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            columns.append(formatting.format_date_series(values))
+        else:
+            columns.append(values.astype(object).where(values.notna(), ""))
+
+    return pd.concat(columns, axis=1).values.tolist() if columns else []
+
 def format_table_data(df):
     """Formata os dados da tabela para o PDF."""
     # Limitar a 20 primeiras linhas para o PDF não ficar muito grande
-    pdf_data = [df.columns.tolist()] + df.head(20).values.tolist()
-
-    # Aplicando formatação para os valores monetários e data
-    for i, row in enumerate(pdf_data[1:]):  # pular o cabeçalho
-        for j, value in enumerate(row):
-            if isinstance(value, (int, float)):
-                pdf_data[i + 1][j] = format_currency(value)
-            elif isinstance(value, datetime):
-                pdf_data[i + 1][j] = value.strftime('%d/%m/%Y')
+    pdf_data = [df.columns.tolist()] + format_table_rows(df.head(20))
 
     # Adicionar linha para totais (se o DataFrame tiver linhas)
     if len(df) > 0:
@@ -75,6 +85,48 @@ def format_table_data(df):
 
     return pdf_data
 
+def create_totals_row(df, totals=None):
+    """
+    Linha de totais do relatório completo.
+
+    Com totals (total_desagio, total_valor_operado, prazo_medio_geral), já
+    calculados sobre as operações (ver data_processing.calculate_totals),
+    os valores são usados como estão; é o caso de linhas já agrupadas, cujo
+    total não pode ser refeito a partir delas. Sem totals, a linha é
+    calculada sobre todas as linhas (de detalhe): soma dos valores e prazo
+    médio ponderado pelo valor operado.
+    """
+    if totals is not None:
+        total_desagio, total_valor_operado, prazo_medio_geral = totals
+        given = {'desagio': total_desagio, 'valor': total_valor_operado}
+        return [
+            "TOTAL" if i == 0
+            else format_currency(given[VALUE_COLUMNS[col]]) if col in VALUE_COLUMNS
+            else formatting.format_decimal(prazo_medio_geral or 0, 2) if col in PRAZO_COLUMNS
+            else ""
+            for i, col in enumerate(df.columns)
+        ]
+
+    value_column = next((col for col, kind in VALUE_COLUMNS.items()
+                         if kind == 'valor' and col in df.columns), None)
+    totals_row = []
+
+    for i, col in enumerate(df.columns):
+        if i == 0:
+            totals_row.append("TOTAL")
+        elif col in VALUE_COLUMNS:
+            totals_row.append(format_currency(pd.to_numeric(df[col], errors='coerce').astype('float64').sum()))
+        elif col in PRAZO_COLUMNS and value_column is not None:
+            prazo = pd.to_numeric(df[col], errors='coerce').astype('float64')
+            valor = pd.to_numeric(df[value_column], errors='coerce').astype('float64')
+            total = valor.sum()
+            weighted = (prazo * valor).sum() / total if total > 0 else 0
+            totals_row.append(formatting.format_decimal(weighted, 2))
+        else:
+            totals_row.append("")
+
+    return totals_row
+
 def get_column_widths(df):
     """Define as larguras das colunas para a tabela."""
     col_widths = [None] * len(df.columns)
@@ -98,7 +150,7 @@ def get_column_widths(df):
 
     return col_widths, col_indices
 
-def create_table_style(col_indices):
+def create_table_style(col_indices, has_totals=True):
     """Cria o estilo da tabela."""
     style = TableStyle([
         # Cabeçalho
@@ -121,31 +173,36 @@ def create_table_style(col_indices):
         ('TOPPADDING', (0, 1), (-1, -1), 6),
 
         # Grade
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
         ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
         ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
 
-        # Linhas alternadas para melhor leitura
-        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.lightgrey]),
-
-        # Estilo para linha de total
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightblue),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
     ])
 
+    last_body_row = -2 if has_totals else -1
+
+    # Linhas alternadas para melhor leitura
+    style.add('ROWBACKGROUNDS', (0, 1), (-1, last_body_row), [colors.white, colors.lightgrey])
+
+    # Estilo para linha de total
+    if has_totals:
+        style.add('BACKGROUND', (0, -1), (-1, -1), colors.lightblue)
+        style.add('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold')
+
     # Adicionar estilo específico para reduzir a fonte da coluna CEDENTE
     if 'cedente' in col_indices:
         cedente_idx = col_indices['cedente']
-        style.add('FONTSIZE', (cedente_idx, 1), (cedente_idx, -2), 7)
+        style.add('FONTSIZE', (cedente_idx, 1), (cedente_idx, last_body_row), 7)
 
     return style
 
-def add_footer(elements, df):
+def add_footer(elements, df, truncated=True):
     """Adiciona o rodapé ao relatório."""
     styles = getSampleStyleSheet()
     elements.append(Spacer(1, 20))
 
     footer_text = "Nota: Este relatório contém informações confidenciais."
-    if len(df) > 20:
+    if truncated and len(df) > 20:
         footer_text += f" Apenas as primeiras 20 de {len(df)} linhas são mostradas no PDF."
 
     elements.append(Paragraph(footer_text, styles['Italic']))
@@ -190,3 +247,107 @@ def generate_pdf_report(df, filtered=False):
     doc.build(elements)
 
     return buffer
+
+# Relatório completo
+ROW_HEIGHT = 16
+HEADER_ROW_HEIGHT = 24
+
+class _StreamingFlowables(list):
+    """
+    Lista de flowables que é reabastecida sob demanda a partir de um
+    gerador, para que o doc.build do ReportLab nunca tenha todas as tabelas
+    do relatório em memória ao mesmo tempo.
+    """
+
+    def __init__(self, flowables, prefetch=4):
+        super().__init__()
+        self._source = iter(flowables)
+        self._prefetch = prefetch
+        self._fill()
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._prefetch:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+def _rows_per_page(doc, header_elements, first_page):
+    """Número de linhas de dados que cabem em uma página com altura fixa de linha."""
+    available = doc.height - 12  # espaçamento interno do frame
+    if first_page:
+        for element in header_elements:
+            _, height = element.wrap(doc.width, doc.height)
+            available -= height + element.getSpaceBefore() + element.getSpaceAfter()
+    return max(1, int((available - HEADER_ROW_HEIGHT) // ROW_HEIGHT) - 1)
+
+def _iter_report_flowables(doc, df, header_elements, footer_elements, totals=None):
+    """Gera cabeçalho, uma tabela por página e rodapé do relatório completo."""
+    yield from header_elements
+
+    header = df.columns.tolist()
+    col_widths, col_indices = get_column_widths(df)
+    first_rows = _rows_per_page(doc, header_elements, first_page=True)
+    page_rows = _rows_per_page(doc, header_elements, first_page=False)
+
+    start = 0
+    total_rows = len(df)
+    while True:
+        end = min(total_rows, start + (first_rows if start == 0 else page_rows))
+        last_chunk = end >= total_rows
+
+        data = [header] + format_table_rows(df.iloc[start:end])
+        if last_chunk:
+            data.append(create_totals_row(df, totals))
+
+        table = Table(
+            data,
+            colWidths=col_widths,
+            rowHeights=[HEADER_ROW_HEIGHT] + [ROW_HEIGHT] * (len(data) - 1),
+            repeatRows=1
+        )
+        table.setStyle(create_table_style(col_indices, has_totals=last_chunk))
+        yield table
+
+        if last_chunk:
+            break
+        yield PageBreak()
+        start = end
+
+    yield from footer_elements
+
+def generate_full_pdf_report(df, output, filtered=False, subtitle=None, totals=None):
+    """
+    Gera o relatório PDF com todas as linhas do DataFrame.
+
+    As linhas são formatadas e diagramadas em blocos de uma página, cada um
+    com o cabeçalho da tabela, e entregues ao ReportLab sob demanda: o tempo
+    de geração cresce linearmente com o número de linhas e apenas um bloco
+    de linhas formatadas (e suas tabelas) existe em memória por vez. O
+    ReportLab ainda guarda o conteúdo já desenhado de cada página até gravar
+    o arquivo (cerca de 13 KB por página). A última página traz a linha de
+    totais (ver create_totals_row).
+
+    Args:
+        df (pandas.DataFrame): DataFrame a ser incluído no PDF
+        output (str or file): Caminho do arquivo ou stream de saída
+        filtered (bool, optional): Indica se os dados estão filtrados. Defaults to False.
+        subtitle (str, optional): Linha abaixo do título (ex.: gerente e período)
+        totals (tuple, optional): (total_desagio, total_valor_operado,
+            prazo_medio_geral) das operações; obrigatório quando df já está
+            agrupado
+
+    Returns:
+        str or file: O próprio output
+    """
+    doc = create_document(output)
+    header_elements = add_header([], filtered, subtitle)
+    footer_elements = add_footer([], df, truncated=False)
+
+    doc.build(_StreamingFlowables(_iter_report_flowables(doc, df, header_elements, footer_elements, totals)))
+
+    return output
@@ -0,0 +1,286 @@
+import weakref
+import threading
+import numpy as np
+import pandas as pd
+
+# Medidas acumuladas por dia
+PREFIX_MEASURES = ['valor_bruto', 'valor_desagio', 'prazo_ponderado', 'operacoes']
+
+# Níveis do índice além do total geral
+PREFIX_LEVELS = ('gerente', 'cedente')
+
+# Periodicidades do gráfico de evolução (rótulo -> frequência de período)
+EVOLUTION_FREQUENCIES = {'Diária': 'D', 'Semanal': 'W-SUN', 'Mensal': 'M'}
+
+# Índices já construídos, por cubo (id do DataFrame)
+_indexes = {}
+_lock = threading.Lock()
+
+def build_prefix_index(cube, levels=PREFIX_LEVELS):
+    """
+    Constrói o índice de somas acumuladas por dia a partir do cubo diário
+    (rollup.build_rollup).
+
+    Para o total geral e para cada valor de cada nível (gerente, cedente)
+    guarda as somas acumuladas das medidas nos dias em que houve operação
+    (operações sem data ficam em uma posição após o último dia).
+    As células de todos os valores de um nível ficam em um único array,
+    ordenado pela chave composta (código do valor, posição do dia), de modo
+    que o total de qualquer período, para qualquer conjunto de valores, sai
+    de duas buscas binárias e uma subtração por valor.
+
+    Args:
+        cube (pandas.DataFrame): Cubo diário (gerentes já renomeados)
+        levels (tuple, optional): Colunas com índice próprio
+
+    Returns:
+        dict: 'days' (dias com operação, ordenados), 'width' e, por nível
+            ('levels'; None para o total geral), 'categories', 'composite'
+            e 'cum' (somas acumuladas por medida, com zero inicial)
+    """
+    dated = cube['dia'].notna().to_numpy()
+    days, dated_positions = np.unique(cube['dia'].to_numpy()[dated], return_inverse=True)
+    day_positions = np.full(len(cube), len(days), dtype='int64')
+    day_positions[dated] = dated_positions
+    width = len(days) + 2
+
+    values = {
+        measure: pd.to_numeric(cube[measure]).to_numpy(dtype='float64')
+        for measure in PREFIX_MEASURES
+        if measure in cube.columns
+    }
+    index = {'days': days, 'width': width, 'levels': {}}
+
+    for level in (None,) + tuple(levels):
+        if level is None:
+            categories = pd.Index(['TOTAL'])
+            codes = np.zeros(len(cube), dtype='int64')
+        else:
+            series = cube[level]
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype('category')
+            categories = series.cat.categories
+            codes = series.cat.codes.to_numpy().astype('int64')
+
+        valid = codes >= 0
+        composite = codes[valid] * width + day_positions[valid]
+        order = np.argsort(composite, kind='stable')
+        composite = composite[order]
+
+        # Células repetidas (outras dimensões do cubo) somadas em uma só
+        unique, starts = np.unique(composite, return_index=True)
+        cum = {}
+        for measure, measure_values in values.items():
+            sums = np.add.reduceat(measure_values[valid][order], starts) if len(starts) else np.array([])
+            cum[measure] = np.concatenate([[0.0], np.cumsum(sums)])
+
+        index['levels'][level] = {'categories': categories, 'composite': unique, 'cum': cum}
+
+    return index
+
+def get_prefix_index(cube):
+    """
+    Retorna o índice de somas acumuladas do cubo, construindo-o apenas na
+    primeira vez que o cubo é visto.
+    """
+    key = id(cube)
+    with _lock:
+        entry = _indexes.get(key)
+    if entry is not None and entry[0]() is cube:
+        return entry[1]
+
+    # Construído fora do lock; outras sessões podem inserir ao mesmo tempo
+    index = build_prefix_index(cube)
+
+    with _lock:
+        # Descartar índices de cubos que já foram liberados
+        for stale in [k for k, (ref, _) in _indexes.items() if ref() is None]:
+            del _indexes[stale]
+
+        entry = _indexes.get(key)
+        if entry is not None and entry[0]() is cube:
+            return entry[1]
+        _indexes[key] = (weakref.ref(cube), index)
+    return index
+
+def _day_position(index, date, after=False):
+    """Número de dias do índice antes de date (ou até date, se after)."""
+    target = np.datetime64(pd.Timestamp(date).normalize().to_datetime64(), 'ns')
+    if after:
+        target = target + np.timedelta64(1, 'D')
+    return np.searchsorted(index['days'], target, side='left')
+
+def _cumulative(index, level, codes, positions):
+    """Somas acumuladas por medida, com forma (valores, posições)."""
+    data = index['levels'][level]
+    targets = codes[:, None] * index['width'] + positions[None, :]
+    at = np.searchsorted(data['composite'], targets, side='left')
+    return {measure: cum[at] for measure, cum in data['cum'].items()}
+
+def _codes_for(index, level, keys):
+    categories = index['levels'][level]['categories']
+    if keys is None:
+        return np.arange(len(categories), dtype='int64')
+    codes = categories.get_indexer(list(keys))
+    return codes[codes >= 0].astype('int64')
+
+def range_totals(index, start_date=None, end_date=None, level=None, keys=None):
+    """
+    Totais do período [start_date, end_date] por valor do nível.
+
+    Como em data_processing.apply_date_filter, o período só é aplicado com
+    as duas datas; sem nenhuma delas, entram também as operações sem data.
+
+    Args:
+        index (dict): Índice de build_prefix_index
+        start_date (date, optional): Data inicial (inclusive)
+        end_date (date, optional): Data final (inclusive)
+        level (str, optional): 'gerente', 'cedente' ou None (total geral)
+        keys (list, optional): Valores do nível; se None, todos
+
+    Returns:
+        pandas.DataFrame: Somas das medidas por valor e o prazo médio
+            ponderado pelo valor operado ('prazo_medio')
+    """
+    if start_date is not None and end_date is not None:
+        first = _day_position(index, start_date)
+        last = max(first, _day_position(index, end_date, after=True))
+    else:
+        first, last = 0, len(index['days']) + 1
+
+    codes = _codes_for(index, level, keys)
+    cum = _cumulative(index, level, codes, np.array([first, last], dtype='int64'))
+
+    totals = pd.DataFrame(
+        {measure: values[:, 1] - values[:, 0] for measure, values in cum.items()},
+        index=index['levels'][level]['categories'][codes]
+    )
+
+    valor = totals['valor_bruto'].to_numpy()
+    ponderado = totals['prazo_ponderado'].to_numpy() if 'prazo_ponderado' in totals else np.zeros(len(totals))
+    totals['prazo_medio'] = np.divide(ponderado, valor, out=np.zeros(len(totals)), where=valor > 0)
+    return totals
+
+def selection_level(selection, user_group=None):
+    """
+    Nível e valores do índice equivalentes à seleção de filtros e à
+    restrição por gerente, ou None se a seleção não puder ser respondida
+    pelo índice (filtro de etapa ou filtros de cedente e gerente juntos).
+    """
+    selection = selection or {}
+    if selection.get('etapas'):
+        return None
+
+    cedentes = selection.get('cedentes') or None
+    gerentes = selection.get('gerentes') or None
+    if user_group is not None and user_group != "ADM":
+        gerentes = [gerente for gerente in (gerentes or [user_group]) if gerente == user_group]
+
+    if cedentes is not None and gerentes is not None:
+        return None
+    if cedentes is not None:
+        return 'cedente', cedentes
+    if gerentes is not None:
+        return 'gerente', gerentes
+    return None, None
+
+def selection_totals(index, selection=None, user_group=None):
+    """
+    Totais da seleção (mesmo formato de data_processing.calculate_totals)
+    a partir do índice, ou None se a seleção não for suportada.
+
+    Returns:
+        tuple or None: (total_desagio, total_valor_operado, prazo_medio_geral)
+    """
+    selection = selection or {}
+    target = selection_level(selection, user_group)
+    if target is None:
+        return None
+
+    level, keys = target
+    totals = range_totals(index, selection.get('start_date'), selection.get('end_date'), level, keys)
+
+    total_desagio = totals['valor_desagio'].sum()
+    total_valor_operado = totals['valor_bruto'].sum()
+    prazo_medio_geral = 0
+    if 'prazo_ponderado' in totals and total_valor_operado > 0:
+        prazo_medio_geral = totals['prazo_ponderado'].sum() / total_valor_operado
+
+    return total_desagio, total_valor_operado, prazo_medio_geral
+
+def evolution_series(index, start_date=None, end_date=None, freq='D', level=None, keys=None):
+    """
+    Valor operado e deságio por período (dia, semana ou mês) entre
+    start_date e end_date, a partir das somas acumuladas.
+
+    Args:
+        index (dict): Índice de build_prefix_index
+        freq (str, optional): Frequência de período do pandas ('D', 'W-SUN', 'M')
+        level (str, optional): Nível do índice (None para o total geral)
+        keys (list, optional): Valores do nível somados; se None, todos
+
+    Returns:
+        pandas.DataFrame: Uma linha por período (início do período no índice)
+    """
+    days = index['days']
+    if not len(days):
+        return pd.DataFrame(columns=['valor_bruto', 'valor_desagio'])
+
+    first = pd.Timestamp(start_date if start_date is not None else days[0]).normalize()
+    last = pd.Timestamp(end_date if end_date is not None else days[-1]).normalize()
+    if last < first:
+        return pd.DataFrame(columns=['valor_bruto', 'valor_desagio'])
+
+    periods = pd.period_range(first, last, freq=freq)
+    boundaries = periods.start_time.to_numpy().copy()
+    boundaries[0] = first.to_datetime64()
+    boundaries = np.append(boundaries, (last + pd.Timedelta(days=1)).to_datetime64())
+    positions = np.searchsorted(days, boundaries, side='left').astype('int64')
+
+    codes = _codes_for(index, level, keys)
+    cum = _cumulative(index, level, codes, positions)
+
+    return pd.DataFrame(
+        {measure: np.diff(cum[measure].sum(axis=0)) for measure in ['valor_bruto', 'valor_desagio']},
+        index=periods.start_time
+    )
+
+def selection_evolution(index, cube, selection=None, user_group=None, freq='D'):
+    """
+    Série de evolution_series para a seleção de filtros. Quando a seleção
+    não pode ser respondida pelo índice, soma os dias do cubo já filtrado
+    (filter_rollup).
+
+    Args:
+        index (dict): Índice de build_prefix_index do cubo completo
+        cube (pandas.DataFrame): Cubo com a mesma seleção já aplicada
+        selection (dict, optional): Seleção de data_processing.select_filters
+        user_group (str, optional): Grupo do usuário (restrição por gerente)
+        freq (str, optional): Frequência de período ('D', 'W-SUN', 'M')
+
+    Returns:
+        pandas.DataFrame: Valor operado e deságio por período
+    """
+    selection = selection or {}
+    start_date, end_date = selection.get('start_date'), selection.get('end_date')
+    if start_date is None or end_date is None:
+        start_date = end_date = None
+
+    target = selection_level(selection, user_group)
+    if target is not None:
+        return evolution_series(index, start_date, end_date, freq, *target)
+
+    dated = cube[cube['dia'].notna()]
+    if dated.empty:
+        return pd.DataFrame(columns=['valor_bruto', 'valor_desagio'])
+
+    periods = pd.period_range(
+        start_date or dated['dia'].iloc[0], end_date or dated['dia'].iloc[-1], freq=freq
+    )
+    series = (
+        dated.groupby(dated['dia'].dt.to_period(freq))[['valor_bruto', 'valor_desagio']]
+        .sum()
+        .reindex(periods, fill_value=0)
+    )
+    series.index = periods.start_time
+    return series
@@ -0,0 +1,401 @@
+import os
+import argparse
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from data_processing import (
+    FILTER_KEYS, get_gerente_mapping, normalize_gerentes, index_by_date, slice_date_range, aggregate_data
+)
+from database import OPERATIONS_SCHEMA, compact_dataframe
+from local_cache import DATA_FILE, get_cache_dir
+from tracing import traced
+
+# As configurações abaixo são lidas a cada uso (e não na importação), depois
+# do .env carregado por database.connect_to_database
+
+def get_report_backend():
+    """
+    Backend de filtros e agrupamento da página (REPORT_BACKEND): "pandas"
+    (padrão, referência sobre o DataFrame em memória) ou "duckdb" (SQL
+    vetorizado e paralelo).
+    """
+    return os.getenv("REPORT_BACKEND", "pandas")
+
+def get_duckdb_source():
+    """
+    Origem das operações no DuckDB (DUCKDB_SOURCE): arquivo .duckdb (tabela
+    operacoes, ver build_duckdb) ou arquivo Parquet (padrão: o cache local).
+    """
+    return os.getenv("DUCKDB_SOURCE", os.path.join(get_cache_dir(), DATA_FILE))
+
+def duckdb_cache_dir(source=None):
+    """
+    Diretório do cache local quando a origem do DuckDB é o Parquet do cache
+    (sincronizado com o banco por local_cache); None para outras origens.
+    """
+    source = source or get_duckdb_source()
+    cache_dir = get_cache_dir()
+    directory = os.path.dirname(os.path.abspath(source))
+    if os.path.basename(source) == DATA_FILE and directory == os.path.abspath(cache_dir):
+        return cache_dir
+    return None
+
+def duckdb_source_version(source=None):
+    """
+    Versão da origem do DuckDB (data de modificação do arquivo), usada nas
+    chaves de cache de PDF e gráficos; None se a origem não existir.
+    """
+    source = source or get_duckdb_source()
+    if not os.path.exists(source):
+        return None
+    return datetime.fromtimestamp(os.path.getmtime(source)).isoformat()
+
+def get_duckdb_threads():
+    """Threads usadas pelo DuckDB (DUCKDB_THREADS; 0, o padrão: um por núcleo)."""
+    return int(os.getenv("DUCKDB_THREADS", "0"))
+
+# Colunas expostas pela tabela/visão operacoes
+OPERATION_COLUMNS = list(OPERATIONS_SCHEMA)
+
+_lock = threading.Lock()
+_connections = {}  # origem -> (mtime, conexão)
+
+def filter_operations(df, selection=None, user_group=None):
+    """
+    Aplica a seleção de filtros e a restrição por gerente às operações em
+    memória (backend de referência, sem widgets).
+
+    Args:
+        df (pandas.DataFrame): Operações
+        selection (dict, optional): Chaves de data_processing.select_filters
+        user_group (str, optional): Grupo do usuário (não ADM vê apenas o
+            próprio gerente)
+
+    Returns:
+        pandas.DataFrame: Operações filtradas
+    """
+    selection = selection or {}
+    df = index_by_date(normalize_gerentes(df))
+
+    if selection.get('start_date') is not None and selection.get('end_date') is not None:
+        df = slice_date_range(df, selection['start_date'], selection['end_date'])
+
+    for column, key in FILTER_KEYS.items():
+        if selection.get(key):
+            df = df[df[column].isin(selection[key])]
+
+    if user_group is not None and user_group != "ADM":
+        df = df[df['gerente'] == user_group]
+
+    return df
+
+def compile_selection(selection=None, user_group=None):
+    """
+    Traduz a seleção de filtros e a restrição por gerente para uma cláusula
+    WHERE do DuckDB com parâmetros posicionais.
+
+    Returns:
+        tuple: (lista de condições SQL, lista de parâmetros)
+    """
+    selection = selection or {}
+    conditions, params = [], []
+
+    if selection.get('start_date') is not None and selection.get('end_date') is not None:
+        conditions.append("data >= CAST(? AS TIMESTAMP) AND data < CAST(? AS TIMESTAMP)")
+        params += [
+            datetime.combine(selection['start_date'], datetime.min.time()),
+            datetime.combine(selection['end_date'], datetime.min.time()) + timedelta(days=1),
+        ]
+
+    for column, key in FILTER_KEYS.items():
+        values = selection.get(key)
+        if values:
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += list(values)
+
+    if user_group is not None and user_group != "ADM":
+        conditions.append("gerente = ?")
+        params.append(user_group)
+
+    return conditions, params
+
+def _where(conditions):
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+def _quote(path):
+    return "'" + path.replace("'", "''") + "'"
+
+def _open_duckdb(source):
+    """
+    Abre a origem no DuckDB com a tabela ou visão operacoes, já com os
+    gerentes renomeados.
+    """
+    import duckdb
+
+    if source.endswith(".parquet"):
+        connection = duckdb.connect()
+
+        # Gerentes renomeados na visão por junção com o mapeamento (como
+        # data_processing.normalize_gerentes)
+        mapping = pd.DataFrame(list(get_gerente_mapping().items()), columns=['origem', 'exibicao'])
+        connection.register('mapeamento', mapping)
+        connection.execute("CREATE TABLE gerentes_mapeamento AS SELECT * FROM mapeamento")
+        connection.unregister('mapeamento')
+
+        available = set(
+            connection.execute(f"DESCRIBE SELECT * FROM read_parquet({_quote(source)})").df()['column_name']
+        )
+        columns = [
+            "COALESCE(m.exibicao, CAST(o.gerente AS VARCHAR)) AS gerente" if column == 'gerente'
+            else f"o.{column}"
+            for column in OPERATION_COLUMNS if column in available
+        ]
+        connection.execute(f"""
+            CREATE VIEW operacoes AS
+            SELECT {', '.join(columns)}
+            FROM read_parquet({_quote(source)}) o
+            LEFT JOIN gerentes_mapeamento m ON UPPER(TRIM(CAST(o.gerente AS VARCHAR))) = m.origem
+        """)
+    else:
+        connection = duckdb.connect(source, read_only=True)
+
+    threads = get_duckdb_threads()
+    if threads > 0:
+        connection.execute(f"SET threads = {threads}")
+    return connection
+
+def get_duckdb(source=None):
+    """
+    Retorna um cursor do DuckDB sobre a origem (uma conexão por arquivo,
+    reaberta quando o arquivo muda; um cursor por chamada, para uso em
+    threads diferentes).
+    """
+    source = source or get_duckdb_source()
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Origem do DuckDB não encontrada: {source}")
+
+    mtime = os.path.getmtime(source)
+    with _lock:
+        entry = _connections.get(source)
+        if entry is None or entry[0] != mtime:
+            if entry is not None:
+                entry[1].close()
+            entry = (mtime, _open_duckdb(source))
+            _connections[source] = entry
+        return entry[1].cursor()
+
+def _query(sql, params, source=None):
+    cursor = get_duckdb(source)
+    try:
+        return cursor.execute(sql, params).df()
+    finally:
+        cursor.close()
+
+def _columns(source=None):
+    return set(_query("DESCRIBE operacoes", [], source)['column_name'])
+
+def duckdb_filter_options(user_group=None, source=None):
+    """
+    Combinações distintas de cedente, gerente e etapa com o período de cada
+    uma (mesmo formato de database.fetch_filter_options, gerentes já
+    renomeados).
+    """
+    conditions, params = compile_selection(user_group=user_group)
+    return _query(f"""
+        SELECT cedente, gerente, etapa, MIN(data) AS data_min, MAX(data) AS data_max
+        FROM operacoes {_where(conditions)}
+        GROUP BY cedente, gerente, etapa
+    """, params, source)
+
+@traced()
+def duckdb_operations(source=None, user_group=None, **selection):
+    """Operações filtradas, ordenadas por data (detalhe para PDF e exportação)."""
+    conditions, params = compile_selection(selection, user_group)
+    df = _query(
+        f"SELECT * FROM operacoes {_where(conditions)} ORDER BY data NULLS LAST", params, source
+    )
+    df = compact_dataframe(df)
+    df.attrs['gerentes_normalizados'] = True
+    return df
+
+@traced()
+def duckdb_aggregated_data(source=None, user_group=None, with_cells=False, **selection):
+    """
+    Agrupa as operações filtradas no DuckDB.
+
+    Produz o mesmo resultado de data_processing.aggregate_data aplicado às
+    operações filtradas (filter_operations).
+
+    Args:
+        source (str, optional): Origem (ver get_duckdb_source)
+        user_group (str, optional): Grupo do usuário
+        with_cells (bool, optional): Retorna também as células agrupadas,
+            inclusive as de chave nula (base dos gráficos)
+        **selection: Chaves de data_processing.select_filters
+
+    Returns:
+        tuple: (df_grouped numérico, (total_desagio, total_valor_operado, prazo_medio_geral))
+            e, com with_cells, as células
+    """
+    conditions, params = compile_selection(selection, user_group)
+    has_prazo_medio = 'prazo_medio' in _columns(source)
+
+    prazo = ", AVG(prazo_medio) AS prazo_medio" if has_prazo_medio else ""
+    cells = _query(f"""
+        SELECT cedente, gerente, etapa, MAX(data) AS data,
+               SUM(valor_desagio) AS valor_desagio, SUM(valor_bruto) AS valor_bruto{prazo}
+        FROM operacoes {_where(conditions)}
+        GROUP BY cedente, gerente, etapa
+        ORDER BY cedente, gerente, etapa
+    """, params, source)
+
+    # Como no groupby do pandas, grupos com chave nula ficam fora da tabela
+    df_grouped = cells.dropna(subset=list(FILTER_KEYS)).reset_index(drop=True)
+
+    # Totais sobre todas as linhas, inclusive as sem cedente/gerente/etapa
+    ponderado = "SUM(prazo_medio * valor_bruto)" if has_prazo_medio else "0"
+    totals = _query(f"""
+        SELECT COALESCE(SUM(valor_desagio), 0) AS total_desagio,
+               COALESCE(SUM(valor_bruto), 0) AS total_valor_operado,
+               COALESCE({ponderado}, 0) AS prazo_ponderado
+        FROM operacoes {_where(conditions)}
+    """, params, source).iloc[0]
+
+    prazo_medio_geral = 0
+    if has_prazo_medio and totals['total_valor_operado'] > 0:
+        prazo_medio_geral = totals['prazo_ponderado'] / totals['total_valor_operado']
+
+    totals = (totals['total_desagio'], totals['total_valor_operado'], prazo_medio_geral)
+    return (df_grouped, totals, cells) if with_cells else (df_grouped, totals)
+
+def pandas_aggregated_data(df, user_group=None, **selection):
+    """Backend de referência: aggregate_data sobre filter_operations."""
+    return aggregate_data(filter_operations(df, selection, user_group))
+
+def compare_aggregated(expected, result, rtol=1e-9):
+    """
+    Compara dois resultados de agrupamento (df_grouped, totais), com as
+    linhas ordenadas por cedente, gerente e etapa.
+
+    Args:
+        expected (tuple): Resultado de referência (pandas_aggregated_data)
+        result (tuple): Resultado comparado (ex.: duckdb_aggregated_data)
+        rtol (float, optional): Tolerância relativa dos valores numéricos
+
+    Returns:
+        list: Descrição de cada diferença encontrada (vazia se forem iguais)
+    """
+    keys = list(FILTER_KEYS)
+    expected_grouped, result_grouped = (
+        grouped.astype({column: str for column in keys})
+        .sort_values(keys, ignore_index=True)
+        for grouped in (expected[0], result[0])
+    )
+
+    if list(expected_grouped.columns) != list(result_grouped.columns):
+        return [f"colunas: {list(expected_grouped.columns)} != {list(result_grouped.columns)}"]
+    if len(expected_grouped) != len(result_grouped):
+        return [f"linhas: {len(expected_grouped)} != {len(result_grouped)}"]
+
+    differences = []
+    for column in expected_grouped.columns:
+        a, b = expected_grouped[column], result_grouped[column]
+        if column in keys:
+            same = (a.to_numpy() == b.to_numpy()).all()
+        elif column == 'data':
+            a, b = pd.to_datetime(a), pd.to_datetime(b)
+            same = ((a == b) | (a.isna() & b.isna())).all()
+        else:
+            same = np.allclose(a.astype(float), b.astype(float), rtol=rtol, equal_nan=True)
+        if not same:
+            differences.append(f"coluna {column}")
+
+    names = ['total_desagio', 'total_valor_operado', 'prazo_medio_geral']
+    for name, a, b in zip(names, expected[1], result[1]):
+        if not np.isclose(float(a), float(b), rtol=rtol):
+            differences.append(f"{name}: {a} != {b}")
+
+    return differences
+
+def build_duckdb(df, path):
+    """
+    Grava as operações (gerentes renomeados, ordenadas por data) na tabela
+    operacoes de um arquivo DuckDB, substituindo-o de forma atômica.
+    """
+    import duckdb
+
+    df = index_by_date(normalize_gerentes(df))
+    columns = [column for column in OPERATION_COLUMNS if column in df.columns]
+    select = ", ".join(
+        f"CAST({column} AS VARCHAR) AS {column}" if OPERATIONS_SCHEMA[column] == 'category' else column
+        for column in columns
+    )
+
+    temporary = f"{path}.tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+
+    connection = duckdb.connect(temporary)
+    try:
+        connection.register('origem', df[columns])
+        connection.execute(f"CREATE TABLE operacoes AS SELECT {select} FROM origem")
+    finally:
+        connection.close()
+
+    os.replace(temporary, path)
+    return path
+
+if __name__ == "__main__":
+    import random
+
+    parser = argparse.ArgumentParser(description="Backend DuckDB das operações.")
+    parser.add_argument("acao", choices=["carregar", "verificar"],
+                        help="carregar: grava o cache local em um arquivo .duckdb; "
+                             "verificar: compara DuckDB e pandas em seleções aleatórias")
+    parser.add_argument("--destino", default=None,
+                        help="arquivo .duckdb (padrão: operacoes.duckdb no diretório do cache)")
+    parser.add_argument("--origem", default=None, help="origem do DuckDB na verificação")
+    parser.add_argument("--amostras", type=int, default=20)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from local_cache import load_cache
+
+    load_dotenv(".env")
+
+    df = load_cache(reuse=False)
+    if df is None:
+        parser.error("cache local não encontrado; execute python local_cache.py antes")
+
+    if args.acao == "carregar":
+        print(build_duckdb(df, args.destino or os.path.join(get_cache_dir(), "operacoes.duckdb")))
+    else:
+        df = index_by_date(normalize_gerentes(df))
+        rng = random.Random(0)
+        cedentes = sorted(df['cedente'].dropna().unique())
+        gerentes = sorted(df['gerente'].dropna().unique())
+        etapas = sorted(df['etapa'].dropna().unique())
+        failures = 0
+
+        for _ in range(args.amostras):
+            selection = {}
+            if df.attrs['data_min'] is not None:
+                days = (df.attrs['data_max'] - df.attrs['data_min']).days
+                start = df.attrs['data_min'] + timedelta(days=rng.randint(0, days))
+                selection['start_date'] = start
+                selection['end_date'] = start + timedelta(days=rng.randint(0, 90))
+            if cedentes and rng.random() < 0.3:
+                selection['cedentes'] = rng.sample(cedentes, min(3, len(cedentes)))
+            if etapas and rng.random() < 0.3:
+                selection['etapas'] = rng.sample(etapas, min(2, len(etapas)))
+            user_group = rng.choice(["ADM"] + gerentes)
+
+            expected = pandas_aggregated_data(df, user_group, **selection)
+            result = duckdb_aggregated_data(args.origem, user_group, **selection)
+
+            differences = compare_aggregated(expected, result)
+            failures += bool(differences)
+            print("ok" if not differences else f"DIFERENTE ({'; '.join(differences)})", user_group, selection)
+
+        raise SystemExit(1 if failures else 0)
@@ -0,0 +1,283 @@
+import numpy as np
+import pandas as pd
+from database import get_fetch_chunksize, OPERATIONS_SCHEMA, build_operations_query, compact_dataframe, concat_compact, iter_chunks
+from data_processing import normalize_gerentes
+from data_processing import FILTER_KEYS
+from tracing import traced
+
+# Dimensões do cubo (além do dia)
+ROLLUP_DIMENSIONS = ['cedente', 'gerente', 'etapa']
+
+# Tipos de armazenamento das colunas do cubo (ver database.OPERATIONS_SCHEMA).
+# As somas ficam em float64: são reagregadas a cada consulta
+ROLLUP_SCHEMA = {
+    'dia': 'datetime',
+    'cedente': 'category',
+    'gerente': 'category',
+    'etapa': 'category',
+    'data': 'datetime',
+    'operacoes': 'number',
+    'prazo_qtd': 'number',
+}
+
+def _codes(series):
+    """Categorias e códigos de uma coluna (nulos com código -1)."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    return series.cat.categories, series.cat.codes.to_numpy()
+
+# Agregação de cada medida ao juntar células com a mesma chave
+MERGE_AGGREGATIONS = {
+    'data': 'max',
+    'operacoes': 'sum',
+    'valor_desagio': 'sum',
+    'valor_bruto': 'sum',
+    'prazo_ponderado': 'sum',
+    'prazo_soma': 'sum',
+    'prazo_qtd': 'sum',
+}
+
+def _group_cells(work, categories, agg_dict):
+    """
+    Agrupa work pelas colunas de códigos (e pelo dia, se houver) e refaz as
+    colunas category do resultado, ordenado por dia (dias nulos no final).
+    """
+    keys = [column for column in ['dia'] + ROLLUP_DIMENSIONS if column in work.columns]
+    cube = work.groupby(keys, sort=False).agg(**agg_dict).reset_index()
+
+    for column in ROLLUP_DIMENSIONS:
+        cube[column] = pd.Categorical.from_codes(cube[column].to_numpy(), categories=categories[column])
+
+    if 'dia' in cube.columns:
+        cube['dia'] = cube['dia'].to_numpy().view('datetime64[ns]')
+        cube = cube.sort_values('dia', kind='mergesort', na_position='last', ignore_index=True)
+    return compact_dataframe(cube, ROLLUP_SCHEMA)
+
+def build_rollup(df, daily=True):
+    """
+    Constrói o cubo diário de operações por (dia, cedente, gerente, etapa).
+
+    Cada célula guarda as somas de valor_bruto, valor_desagio e
+    prazo_medio * valor_bruto, a soma e a quantidade de prazos informados e
+    o número de operações, o suficiente para reconstruir a tabela agrupada,
+    a linha de totais e os gráficos sem voltar às linhas de detalhe.
+
+    O agrupamento é feito sobre os códigos das categorias, de modo que
+    operações com cedente, gerente ou etapa nulos também entram no cubo
+    (contam nos totais, como em data_processing.calculate_totals).
+
+    Args:
+        df (pandas.DataFrame): Operações (gerentes no formato do banco ou já
+            renomeados)
+        daily (bool, optional): Se False, agrupa apenas por cedente, gerente
+            e etapa (sem o dia)
+
+    Returns:
+        pandas.DataFrame: Cubo ordenado por dia (dias nulos no final)
+    """
+    keys = {'dia': df['data'].dt.normalize().to_numpy().view('int64')} if daily else {}
+    categories = {}
+    for column in ROLLUP_DIMENSIONS:
+        categories[column], keys[column] = _codes(df[column])
+
+    valor = pd.to_numeric(df['valor_bruto'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    work = pd.DataFrame(keys)
+    work['data'] = df['data'].to_numpy()
+    work['operacoes'] = 1
+    work['valor_desagio'] = pd.to_numeric(df['valor_desagio'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    work['valor_bruto'] = valor
+
+    agg_dict = {
+        'data': ('data', 'max'),
+        'operacoes': ('operacoes', 'sum'),
+        'valor_desagio': ('valor_desagio', 'sum'),
+        'valor_bruto': ('valor_bruto', 'sum'),
+    }
+
+    if 'prazo_medio' in df.columns:
+        prazo = pd.to_numeric(df['prazo_medio'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        work['prazo_ponderado'] = prazo * valor
+        work['prazo_soma'] = prazo
+        work['prazo_qtd'] = (~np.isnan(prazo)).astype('int64')
+        agg_dict['prazo_ponderado'] = ('prazo_ponderado', 'sum')
+        agg_dict['prazo_soma'] = ('prazo_soma', 'sum')
+        agg_dict['prazo_qtd'] = ('prazo_qtd', 'sum')
+
+    return _group_cells(work, categories, agg_dict)
+
+def merge_rollup(cubes):
+    """
+    Junta cubos (ou células parciais) somando as medidas das células com a
+    mesma chave; data fica com o máximo.
+
+    Args:
+        cubes (list): Cubos de build_rollup com as mesmas colunas
+
+    Returns:
+        pandas.DataFrame: Cubo com uma célula por chave
+    """
+    cube = concat_compact(list(cubes), ROLLUP_SCHEMA)
+
+    work = pd.DataFrame(index=cube.index)
+    categories = {}
+    if 'dia' in cube.columns:
+        work['dia'] = cube['dia'].to_numpy().view('int64')
+    for column in ROLLUP_DIMENSIONS:
+        categories[column], work[column] = _codes(cube[column])
+
+    agg_dict = {}
+    for column, func in MERGE_AGGREGATIONS.items():
+        if column in cube.columns:
+            work[column] = cube[column].to_numpy()
+            agg_dict[column] = (column, func)
+
+    return _group_cells(work, categories, agg_dict)
+
+def fold_rollup(chunks, daily=False):
+    """
+    Agrega blocos de operações um a um em células acumuladas (sem o dia, por
+    padrão), sem manter as linhas de detalhe: a memória usada é proporcional
+    ao número de grupos, não ao número de operações.
+
+    Args:
+        chunks (iterable): Blocos de operações (gerentes no formato do banco)
+        daily (bool, optional): Mantém o dia na chave das células
+
+    Returns:
+        pandas.DataFrame or None: Células acumuladas (None se não houver blocos)
+    """
+    cells = None
+    for chunk in chunks:
+        partial = build_rollup(normalize_gerentes(chunk), daily=daily)
+        cells = partial if cells is None else merge_rollup([cells, partial])
+    return cells
+
+def refresh_rollup(cube, delta, since):
+    """
+    Atualiza o cubo de forma incremental.
+
+    Os dias a partir de since e as células sem dia são descartados e
+    reconstruídos a partir de delta, que deve conter todas as operações com
+    data >= since e todas as operações sem data (como na sincronização de
+    local_cache).
+
+    Args:
+        cube (pandas.DataFrame): Cubo de build_rollup
+        delta (pandas.DataFrame): Operações a partir de since e sem data
+        since (pandas.Timestamp): Início do intervalo reprocessado
+
+    Returns:
+        pandas.DataFrame: Cubo atualizado, ordenado por dia
+    """
+    # Células sem dia saem daqui e voltam com as operações sem data do delta
+    kept = cube[cube['dia'].notna() & (cube['dia'] < since)]
+    return concat_compact([kept, build_rollup(delta)], ROLLUP_SCHEMA)
+
+def filter_rollup(cube, selection=None, user_group=None):
+    """
+    Aplica ao cubo a seleção de filtros da barra lateral (mesmas chaves de
+    data_processing.select_filters) e a restrição por gerente.
+
+    O filtro de período vira uma busca binária sobre os dias ordenados.
+    """
+    selection = selection or {}
+
+    if selection.get('start_date') is not None and selection.get('end_date') is not None:
+        days = cube['dia'].to_numpy()
+        start = days.searchsorted(np.datetime64(selection['start_date'], 'ns'), side='left')
+        end = days.searchsorted(np.datetime64(selection['end_date'], 'ns'), side='right')
+        cube = cube.iloc[start:end]
+
+    for column, key in FILTER_KEYS.items():
+        if selection.get(key):
+            cube = cube[cube[column].isin(selection[key])]
+
+    if user_group is not None and user_group != "ADM":
+        cube = cube[cube['gerente'] == user_group]
+
+    return cube
+
+@traced()
+def aggregate_rollup(cube, totals=None):
+    """
+    Agrupa o cubo (já filtrado) por cedente/gerente/etapa e calcula os totais.
+
+    Produz o mesmo resultado de data_processing.aggregate_data sobre as
+    linhas de detalhe correspondentes.
+
+    Args:
+        cube (pandas.DataFrame): Cubo filtrado (filter_rollup)
+        totals (tuple, optional): Totais já conhecidos (ex.: do índice de
+            somas acumuladas); se informados, não são recalculados
+
+    Returns:
+        tuple: (df_grouped numérico, (total_desagio, total_valor_operado, prazo_medio_geral))
+    """
+    has_prazo_medio = 'prazo_qtd' in cube.columns
+
+    agg_dict = {
+        'data': ('data', 'max'),
+        'valor_desagio': ('valor_desagio', 'sum'),
+        'valor_bruto': ('valor_bruto', 'sum'),
+    }
+    if has_prazo_medio:
+        agg_dict['prazo_soma'] = ('prazo_soma', 'sum')
+        agg_dict['prazo_qtd'] = ('prazo_qtd', 'sum')
+
+    df_grouped = (
+        cube.groupby(ROLLUP_DIMENSIONS, observed=True)
+        .agg(**agg_dict)
+        .reset_index()
+        .sort_values(ROLLUP_DIMENSIONS, ignore_index=True)
+    )
+
+    if has_prazo_medio:
+        quantidade = df_grouped.pop('prazo_qtd').to_numpy(dtype='float64')
+        soma = df_grouped.pop('prazo_soma').to_numpy(dtype='float64')
+        df_grouped['prazo_medio'] = np.divide(
+            soma, quantidade, out=np.full(len(soma), np.nan), where=quantidade > 0
+        )
+
+    if totals is not None:
+        return df_grouped, totals
+
+    # Totais sobre todas as células, inclusive as de cedente/gerente/etapa nulos
+    total_desagio = cube['valor_desagio'].sum()
+    total_valor_operado = cube['valor_bruto'].sum()
+
+    prazo_medio_geral = 0
+    if has_prazo_medio and total_valor_operado > 0:
+        prazo_medio_geral = cube['prazo_ponderado'].sum() / total_valor_operado
+
+    return df_grouped, (total_desagio, total_valor_operado, prazo_medio_geral)
+
+@traced()
+def stream_aggregated_data(engine, chunksize=None, with_cells=False, **filters):
+    """
+    Agrupa as operações lendo-as em blocos por um cursor no servidor e
+    acumulando cada bloco nas células por cedente/gerente/etapa, sem montar
+    a tabela de detalhe.
+
+    Produz o mesmo resultado de data_processing.aggregate_data aplicado às
+    operações filtradas, com os gerentes já renomeados.
+
+    Args:
+        engine: Engine do SQLAlchemy
+        chunksize (int, optional): Linhas por bloco (padrão:
+            database.get_fetch_chunksize)
+        with_cells (bool, optional): Retorna também as células acumuladas,
+            inclusive as de chave nula (base dos gráficos)
+        **filters: Filtros aceitos por database.build_operations_query
+
+    Returns:
+        tuple: (df_grouped numérico, (total_desagio, total_valor_operado, prazo_medio_geral))
+            e, com with_cells, as células
+    """
+    query, params = build_operations_query(**filters)
+    cells = fold_rollup(iter_chunks(engine, query, params, chunksize or get_fetch_chunksize()))
+
+    if cells is None:
+        cells = build_rollup(compact_dataframe(pd.DataFrame(columns=list(OPERATIONS_SCHEMA))), daily=False)
+
+    df_grouped, totals = aggregate_rollup(cells)
+    return (df_grouped, totals, cells) if with_cells else (df_grouped, totals)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import shutil
+import threading
+import argparse
+from datetime import datetime
+import pyarrow.feather as feather
+from data_processing import normalize_gerentes, index_by_date
+
+# As configurações abaixo são lidas a cada uso (e não na importação), depois
+# do .env carregado por database.connect_to_database
+
+def get_snapshot_dir():
+    """
+    Diretório dos snapshots, um subdiretório por versão (SNAPSHOT_DIR,
+    padrão: snapshots dentro de LOCAL_CACHE_DIR).
+    """
+    return os.getenv("SNAPSHOT_DIR", os.path.join(os.getenv("LOCAL_CACHE_DIR", ".cache"), "snapshots"))
+
+def get_snapshot_keep():
+    """Número de versões mantidas (SNAPSHOT_KEEP, padrão 3)."""
+    return int(os.getenv("SNAPSHOT_KEEP", "3"))
+
+def get_snapshot_max_age():
+    """
+    Idade, em segundos, a partir da qual a página avisa que o snapshot está
+    desatualizado (SNAPSHOT_MAX_AGE, padrão 86400).
+    """
+    return int(os.getenv("SNAPSHOT_MAX_AGE", "86400"))
+
+DATA_FILE = "operacoes.arrow"
+ROLLUP_FILE = "rollup.arrow"
+META_FILE = "snapshot.json"
+
+_lock = threading.Lock()
+_loaded = {}  # diretório -> snapshot carregado da versão mais recente
+
+def list_snapshots(snapshot_dir=None):
+    """Versões completas (com metadados gravados), da mais antiga à mais recente."""
+    snapshot_dir = snapshot_dir or get_snapshot_dir()
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(snapshot_dir)
+        if not name.startswith(".") and os.path.exists(os.path.join(snapshot_dir, name, META_FILE))
+    )
+
+def build_snapshot(df, rollup, snapshot_dir=None, keep=None, **metadata):
+    """
+    Grava um novo snapshot: operações já preparadas para a página (gerentes
+    renomeados, tipos compactos, ordenadas por data) e o cubo diário, em
+    Arrow IPC (Feather v2) sem compressão, que pode ser mapeado em memória.
+
+    O snapshot é montado em um diretório temporário e renomeado ao final,
+    de modo que a página nunca lê uma versão incompleta. Apenas as keep
+    versões mais recentes são mantidas.
+
+    Args:
+        df (pandas.DataFrame): Operações (tipos compactos)
+        rollup (pandas.DataFrame): Cubo diário das mesmas operações
+        snapshot_dir (str, optional): Diretório dos snapshots (padrão:
+            get_snapshot_dir())
+        keep (int, optional): Número de versões mantidas (padrão:
+            get_snapshot_keep())
+        **metadata: Informações adicionais gravadas nos metadados (ex.: origem)
+
+    Returns:
+        dict: Metadados do snapshot gravado
+    """
+    snapshot_dir = snapshot_dir or get_snapshot_dir()
+    keep = get_snapshot_keep() if keep is None else keep
+    df = index_by_date(normalize_gerentes(df))
+    rollup = normalize_gerentes(rollup)
+
+    version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    temporary = os.path.join(snapshot_dir, f".{version}")
+    os.makedirs(temporary, exist_ok=True)
+
+    # attrs (datas, marcações) não vão para o arquivo: são refeitos na leitura
+    for frame, name in ((df, DATA_FILE), (rollup, ROLLUP_FILE)):
+        frame = frame.copy(deep=False)
+        frame.attrs = {}
+        feather.write_feather(frame, os.path.join(temporary, name), compression="uncompressed")
+
+    data_min, data_max = df.attrs['data_min'], df.attrs['data_max']
+    metadata = {
+        **metadata,
+        'versao': version,
+        'criado_em': datetime.now().isoformat(),
+        'rows': len(df),
+        'rollup_rows': len(rollup),
+        'data_min': data_min.isoformat() if data_min is not None else None,
+        'data_max': data_max.isoformat() if data_max is not None else None,
+        'size_MB': round(sum(
+            os.path.getsize(os.path.join(temporary, name)) for name in (DATA_FILE, ROLLUP_FILE)
+        ) / 1024 ** 2, 1),
+    }
+    with open(os.path.join(temporary, META_FILE), "w") as file:
+        json.dump(metadata, file, indent=2)
+
+    os.rename(temporary, os.path.join(snapshot_dir, version))
+
+    # Versões antigas: arquivos ainda mapeados por um processo continuam
+    # válidos para ele após a remoção
+    for old in list_snapshots(snapshot_dir)[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+
+    return metadata
+
+def _read_table(path):
+    """Lê um arquivo Arrow IPC mapeado em memória, sem cópia quando possível."""
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+def load_snapshot(snapshot_dir=None):
+    """
+    Carrega o snapshot mais recente, mapeando os arquivos em memória.
+
+    A versão carregada é reutilizada até que uma mais nova seja gravada.
+    As operações já vêm marcadas como normalizadas e ordenadas por data
+    (df.attrs), de modo que a página não refaz esse trabalho.
+
+    Returns:
+        dict or None: 'operacoes', 'rollup' e 'metadata', ou None se não
+            houver snapshot
+    """
+    snapshot_dir = snapshot_dir or get_snapshot_dir()
+    versions = list_snapshots(snapshot_dir)
+    if not versions:
+        return None
+
+    with _lock:
+        loaded = _loaded.get(snapshot_dir)
+        if loaded is not None and loaded['metadata']['versao'] == versions[-1]:
+            return loaded
+
+        path = os.path.join(snapshot_dir, versions[-1])
+        with open(os.path.join(path, META_FILE), "r") as file:
+            metadata = json.load(file)
+
+        df = _read_table(os.path.join(path, DATA_FILE))
+        df.attrs['gerentes_normalizados'] = True
+        df = index_by_date(df)
+
+        rollup = _read_table(os.path.join(path, ROLLUP_FILE))
+        rollup.attrs['gerentes_normalizados'] = True
+
+        loaded = {'operacoes': df, 'rollup': rollup, 'metadata': metadata}
+        _loaded[snapshot_dir] = loaded
+        return loaded
+
+def snapshot_age(metadata):
+    """Idade do snapshot em segundos."""
+    return time.time() - datetime.fromisoformat(metadata['criado_em']).timestamp()
+
+def build_from_source(source="cache", snapshot_dir=None, keep=None):
+    """
+    Monta um snapshot a partir do cache local (sincronizando o delta com o
+    banco antes) ou de uma carga completa do banco.
+    """
+    from database import connect_to_database, fetch_data
+    from rollup import build_rollup
+
+    engine = connect_to_database()
+    if source == "database":
+        df = fetch_data(engine)
+        return build_snapshot(df, build_rollup(df), snapshot_dir, keep, origem=source)
+
+    from local_cache import sync_operations, load_rollup, read_metadata
+
+    df = sync_operations(engine)
+    rollup = load_rollup(reuse=False)
+    return build_snapshot(df, rollup, snapshot_dir, keep, origem=source,
+                          last_sync=read_metadata().get('last_sync'))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o snapshot das operações usado na abertura da página.")
+    parser.add_argument("--origem", choices=["cache", "database"], default="cache",
+                        help="cache local sincronizado com o banco (padrão) ou carga completa do banco")
+    parser.add_argument("--manter", type=int, default=None,
+                        help="número de versões mantidas (padrão: SNAPSHOT_KEEP)")
+    parser.add_argument("--intervalo", type=int, default=0, metavar="SEGUNDOS",
+                        help="repete a geração a cada SEGUNDOS segundos")
+    args = parser.parse_args()
+
+    while True:
+        print(json.dumps(build_from_source(args.origem, keep=args.manter)))
+        if args.intervalo <= 0:
+            break
+        time.sleep(args.intervalo)
@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import argparse
+import calendar
+import hashlib
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from data_processing import normalize_gerentes, index_by_date, slice_date_range, format_dataframes, calculate_totals
+from pdf_generator import generate_full_pdf_report
+
+def get_statement_workers():
+    """
+    Processos que geram os PDFs em paralelo (STATEMENT_WORKERS, padrão: um
+    por núcleo), lido a cada execução, depois do .env carregado por
+    database.connect_to_database.
+    """
+    return int(os.getenv("STATEMENT_WORKERS", str(os.cpu_count() or 1)))
+
+# Manifesto com os totais de cada extrato, gravado na pasta de saída
+MANIFEST_FILE = "manifesto.json"
+
+# Rótulo das operações sem gerente, cedente ou etapa (nome do extrato e
+# linhas da tabela)
+MISSING_LABELS = {'gerente': "SEM GERENTE", 'cedente': "SEM CEDENTE", 'etapa': "SEM ETAPA"}
+
+def month_period(month):
+    """Primeiro e último dia do mês no formato AAAA-MM."""
+    year, number = (int(part) for part in month.split("-"))
+    return date(year, number, 1), date(year, number, calendar.monthrange(year, number)[1])
+
+def _slug(text):
+    """Nome de arquivo a partir do nome do gerente ou cedente."""
+    return re.sub(r"[^\w-]+", "_", str(text)).strip("_") or "_"
+
+def data_hash(df):
+    """Hash do conteúdo de um extrato (detecta dados alterados ao retomar)."""
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:16]
+
+def split_statements(df, by_cedente=False):
+    """
+    Divide as operações do período em extratos, por gerente (e por cedente).
+
+    Args:
+        df (pandas.DataFrame): Operações do período, gerentes já renomeados
+        by_cedente (bool, optional): Um extrato por gerente e cedente
+
+    Yields:
+        tuple: (dict com 'gerente' e, se by_cedente, 'cedente'; operações)
+    """
+    columns = ['gerente', 'cedente'] if by_cedente else ['gerente']
+    series = {}
+    for column in columns:
+        values = df[column]
+        series[column] = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+
+    # Posições de cada combinação de códigos (operações sem gerente ou
+    # cedente ficam com o código -1)
+    groups = df.groupby([series[column].cat.codes.to_numpy() for column in columns], sort=True).indices
+
+    for codes, positions in groups.items():
+        codes = codes if isinstance(codes, tuple) else (codes,)
+        keys = {
+            column: series[column].cat.categories[code] if code >= 0 else MISSING_LABELS[column]
+            for column, code in zip(columns, codes)
+        }
+        yield keys, df.iloc[positions]
+
+def _summary(df):
+    """Totais de um conjunto de operações, para o manifesto."""
+    total_desagio, total_valor_operado, prazo_medio_geral = calculate_totals(df, 'prazo_medio' in df.columns)
+    return {
+        'operacoes': len(df),
+        'total_desagio': round(float(total_desagio), 2),
+        'total_valor_operado': round(float(total_valor_operado), 2),
+        'prazo_medio_geral': round(float(prazo_medio_geral), 4),
+    }
+
+def label_missing(df):
+    """
+    Substitui gerente, cedente e etapa nulos por MISSING_LABELS, para que
+    essas operações continuem na tabela agrupada do extrato (o agrupamento
+    descarta chaves nulas).
+    """
+    labeled = {}
+    for column, label in MISSING_LABELS.items():
+        if column in df.columns and df[column].isna().any():
+            values = df[column]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+            if label not in values.cat.categories:
+                values = values.cat.add_categories([label])
+            labeled[column] = values.fillna(label)
+    return df.assign(**labeled) if labeled else df
+
+def render_statement(df, output, subtitle):
+    """
+    Gera o PDF de um extrato (executado em um processo do pool).
+
+    Todas as operações do extrato entram na tabela (chaves nulas com os
+    rótulos de MISSING_LABELS) e a linha de totais é a das operações, a
+    mesma gravada no manifesto.
+
+    O arquivo é gravado com outro nome e renomeado ao final, de modo que um
+    extrato interrompido nunca fica no lugar de um completo.
+
+    Returns:
+        dict: Totais do extrato
+    """
+    df_grouped = format_dataframes(label_missing(df), numeric=True)[0]
+    totals = calculate_totals(df, 'prazo_medio' in df.columns)
+
+    temporary = f"{output}.tmp"
+    generate_full_pdf_report(df_grouped, temporary, filtered=True, subtitle=subtitle, totals=totals)
+    os.replace(temporary, output)
+
+    return _summary(df)
+
+def _read_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def _write_manifest(path, manifest):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+    os.replace(temporary, path)
+
+def run_statements(df, output_dir, start_date, end_date, by_cedente=False,
+                   workers=None, force=False):
+    """
+    Gera os extratos do período em paralelo, um PDF por gerente (ou por
+    gerente e cedente), e o manifesto com os totais de cada um.
+
+    A execução pode ser retomada: extratos já gerados cujo conteúdo não
+    mudou (mesmo hash no manifesto) não são gerados de novo, e o manifesto
+    é regravado a cada extrato concluído.
+
+    Args:
+        df (pandas.DataFrame): Operações do período, gerentes já renomeados
+        output_dir (str): Pasta de saída
+        start_date (date): Início do período
+        end_date (date): Fim do período
+        by_cedente (bool, optional): Um extrato por gerente e cedente
+        workers (int, optional): Número de processos (padrão:
+            get_statement_workers())
+        force (bool, optional): Gera novamente todos os extratos
+
+    Returns:
+        dict: Manifesto ('extratos', 'total' e 'falhas', se houver)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+
+    period = {'inicio': start_date.isoformat(), 'fim': end_date.isoformat()}
+    previous = _read_manifest(manifest_path)
+    if force or previous.get('periodo') != period or previous.get('por_cedente') != by_cedente:
+        previous = {}
+
+    manifest = {
+        'periodo': period,
+        'por_cedente': by_cedente,
+        'total': _summary(df),
+        'extratos': {},
+    }
+    subtitle_period = f"{start_date:%d/%m/%Y} a {end_date:%d/%m/%Y}"
+
+    jobs = []
+    for keys, part in split_statements(df, by_cedente):
+        name = os.path.join(*(_slug(value) for value in keys.values())) + ".pdf"
+        entry = {**keys, 'hash': data_hash(part)}
+
+        done = previous.get('extratos', {}).get(name)
+        if done is not None and done.get('hash') == entry['hash'] and os.path.exists(os.path.join(output_dir, name)):
+            manifest['extratos'][name] = done
+            continue
+
+        subtitle = " | ".join(f"{column.title()}: {value}" for column, value in keys.items())
+        jobs.append((name, entry, part, f"{subtitle} | Período: {subtitle_period}"))
+
+    _write_manifest(manifest_path, manifest)
+
+    # Extratos maiores primeiro, para equilibrar a carga entre os processos
+    jobs.sort(key=lambda job: len(job[2]), reverse=True)
+    failures = {}
+
+    with ProcessPoolExecutor(max_workers=max(1, workers or get_statement_workers())) as executor:
+        futures = {}
+        for name, entry, part, subtitle in jobs:
+            output = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            futures[executor.submit(render_statement, part, output, subtitle)] = (name, entry)
+
+        for future in as_completed(futures):
+            name, entry = futures[future]
+            try:
+                entry.update(future.result())
+            except Exception as e:
+                failures[name] = str(e)
+                continue
+
+            entry['gerado_em'] = datetime.now().isoformat(timespec='seconds')
+            manifest['extratos'][name] = entry
+            _write_manifest(manifest_path, manifest)
+
+    if failures:
+        manifest['falhas'] = failures
+    manifest['extratos'] = dict(sorted(manifest['extratos'].items()))
+    _write_manifest(manifest_path, manifest)
+    return manifest
+
+def load_period(start_date, end_date, source="database"):
+    """
+    Carrega as operações do período uma única vez, do banco ou do cache
+    local, com os gerentes renomeados.
+    """
+    if source == "cache":
+        from local_cache import load_cache
+
+        df = load_cache()
+        if df is None:
+            raise FileNotFoundError("cache local não encontrado; execute python local_cache.py antes")
+        return slice_date_range(index_by_date(normalize_gerentes(df)), start_date, end_date)
+
+    from database import connect_to_database, fetch_data
+
+    engine = connect_to_database()
+    return normalize_gerentes(fetch_data(engine, start_date=start_date, end_date=end_date))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera os extratos de comissionamento do mês, um PDF por gerente.")
+    parser.add_argument("mes", metavar="AAAA-MM", help="mês de fechamento")
+    parser.add_argument("--saida", help="pasta de saída (padrão: extratos/AAAA-MM)")
+    parser.add_argument("--por-cedente", action="store_true", help="um extrato por gerente e cedente")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="processos em paralelo (padrão: STATEMENT_WORKERS ou um por núcleo)")
+    parser.add_argument("--origem", choices=["database", "cache"], default="database")
+    parser.add_argument("--refazer", action="store_true", help="gera novamente todos os extratos")
+    args = parser.parse_args()
+
+    try:
+        start_date, end_date = month_period(args.mes)
+    except ValueError:
+        parser.error("mês inválido; use o formato AAAA-MM")
+
+    df = load_period(start_date, end_date, args.origem)
+    manifest = run_statements(
+        df, args.saida or os.path.join("extratos", args.mes), start_date, end_date,
+        by_cedente=args.por_cedente, workers=args.processos, force=args.refazer
+    )
+
+    print(f"{len(manifest['extratos'])} extratos, {manifest['total']['operacoes']} operações")
+    for name, error in manifest.get('falhas', {}).items():
+        print(f"Falha em {name}: {error}")
+    if manifest.get('falhas'):
+        raise SystemExit(1)
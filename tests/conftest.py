@@ -0,0 +1,64 @@
+import os
+import sys
+import random
+import sqlite3
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Gerentes da dimensão (com nomes do mapeamento, espaços e caixa diferentes)
+GERENTES = [
+    "*COMERCIAL - ALX",
+    "LEANDRO APARECIDO",
+    "*COMERCIAL - RFA - ADITAR ***",
+    " *comercial - manuel sanji gomes komiyama",
+    "OUTRO GERENTE",
+]
+
+ETAPAS = ["OPERADO", "LIQUIDADO", "PENDENTE"]
+
+def create_operations_database(path, rows=5000, undated=20, seed=1, start=date(2024, 1, 1), days=120):
+    """
+    Cria um banco SQLite com fato_operacoes e dimcedentesconsolidado.
+
+    Há cedentes sem cadastro na dimensão (gerente nulo), operações sem data
+    e operações sem etapa ou sem prazo médio.
+    """
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE fato_operacoes (cedente TEXT, cpf_cnpj_cedente TEXT, etapa TEXT, data DATE, "
+        "prazo_medio REAL, valor_desagio REAL, valor_bruto REAL)"
+    )
+    conn.execute("CREATE TABLE dimcedentesconsolidado (cpf_cnpj TEXT, gerente TEXT)")
+    conn.executemany(
+        "INSERT INTO dimcedentesconsolidado VALUES (?, ?)",
+        [(f"{i:014d}", GERENTES[i % len(GERENTES)]) for i in range(50)]
+    )
+
+    operations = []
+    for k in range(rows):
+        i = rnd.randrange(55)
+        valor_bruto = round(rnd.uniform(1000, 100000), 2)
+        operations.append((
+            f"CEDENTE {i}",
+            f"{i:014d}",
+            rnd.choice(ETAPAS) if k % 97 else None,
+            (start + timedelta(days=rnd.randrange(days))).isoformat() if k >= undated else None,
+            round(rnd.uniform(5, 90), 1) if k % 89 else None,
+            round(valor_bruto * 0.03, 2),
+            valor_bruto,
+        ))
+    conn.executemany("INSERT INTO fato_operacoes VALUES (?, ?, ?, ?, ?, ?, ?)", operations)
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "operacoes.db"
+    create_operations_database(str(path))
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
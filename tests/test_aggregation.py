@@ -0,0 +1,58 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from database import fetch_data, fetch_aggregated_data
+from data_processing import normalize_gerentes, format_dataframes, format_aggregated_data
+from rollup import stream_aggregated_data
+from comissao import chart_data
+
+FILTER_SETS = [
+    {},
+    {'start_date': date(2024, 2, 1), 'end_date': date(2024, 3, 1)},
+    {'user_group': "ALX"},
+    {'gerentes': ["RFA", "LEANDRO AP"], 'etapas': ["OPERADO"]},
+    {'cedentes': ["CEDENTE 3", "CEDENTE 4", "CEDENTE 52"], 'user_group': "ADM"},
+    {'cedentes': ["CEDENTE INEXISTENTE"]},
+]
+
+def _assert_same_report(result, expected):
+    for frame, expected_frame in zip(result[:2], expected[:2]):
+        assert list(frame.columns) == list(expected_frame.columns)
+        assert len(frame) == len(expected_frame)
+        for column in frame.columns:
+            values, expected_values = frame[column], expected_frame[column]
+            if pd.api.types.is_numeric_dtype(expected_values):
+                assert np.allclose(values.astype(float), expected_values.astype(float), equal_nan=True), column
+            else:
+                assert (values.astype(str).to_numpy() == expected_values.astype(str).to_numpy()).all(), column
+
+    for key, value in expected[2].items():
+        assert np.isclose(result[2][key] or 0, value or 0), key
+
+# A página formata os valores apenas na exibição (numeric=True); médias
+# empatadas na terceira casa podem arredondar diferente entre SQL e pandas
+@pytest.mark.parametrize("filters", FILTER_SETS)
+def test_sql_aggregation_matches_pandas(engine, filters):
+    expected = format_dataframes(normalize_gerentes(fetch_data(engine, **filters)), numeric=True)
+    result = format_aggregated_data(*fetch_aggregated_data(engine, **filters), numeric=True)
+    _assert_same_report(result, expected)
+
+@pytest.mark.parametrize("filters", FILTER_SETS)
+def test_streaming_aggregation_matches_pandas(engine, filters):
+    expected = format_dataframes(normalize_gerentes(fetch_data(engine, **filters)), numeric=True)
+    result = format_aggregated_data(*stream_aggregated_data(engine, chunksize=700, **filters), numeric=True)
+    _assert_same_report(result, expected)
+
+def _assert_same_charts(result, expected):
+    assert list(result) == list(expected)
+    for column, series in expected.items():
+        assert list(result[column].index.astype(str)) == list(series.index.astype(str)), column
+        assert np.allclose(result[column].to_numpy(), series.to_numpy()), column
+
+@pytest.mark.parametrize("filters", FILTER_SETS)
+def test_chart_cells_keep_operations_with_null_keys(engine, filters):
+    expected = chart_data(normalize_gerentes(fetch_data(engine, **filters)))
+    for aggregator in (fetch_aggregated_data, stream_aggregated_data):
+        cells = aggregator(engine, with_cells=True, **filters)[2]
+        _assert_same_charts(chart_data(cells), expected)
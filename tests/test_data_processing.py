@@ -0,0 +1,61 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from database import compact_dataframe
+from data_processing import index_by_date, slice_date_range, calculate_totals, normalize_gerentes
+
+def _operations(dates):
+    return pd.DataFrame({
+        'data': pd.to_datetime(pd.Series(dates, dtype=object)),
+        'valor_bruto': np.arange(len(dates), dtype='float64'),
+    })
+
+@pytest.mark.parametrize("dates", [
+    [],
+    [None],
+    [None, None, None, None],
+    ["2024-01-02"],
+    ["2024-01-02", None, None],
+    ["2024-01-03", "2024-01-01", None, "2024-01-02"],
+])
+def test_index_by_date(dates):
+    df = index_by_date(_operations(dates))
+
+    values = df['data'].to_numpy()
+    valid = int((~np.isnat(values)).sum())
+    assert np.isnat(values[valid:]).all()
+    assert (np.diff(values[:valid]) >= np.timedelta64(0)).all()
+    assert df.attrs['data_ordenada']
+
+    sliced = slice_date_range(df, date(2024, 1, 1), date(2024, 1, 2))
+    assert sliced['data'].between('2024-01-01', '2024-01-02').all()
+    assert len(sliced) == sum(day in ("2024-01-01", "2024-01-02") for day in dates)
+
+def test_totals_of_compact_whole_number_columns():
+    df = compact_dataframe(pd.DataFrame({
+        'cedente': ["A", "B"],
+        'gerente': ["G", "G"],
+        'etapa': ["OPERADO", "OPERADO"],
+        'data': pd.to_datetime(["2024-01-01", "2024-01-02"]),
+        'prazo_medio': [60, 90],
+        'valor_desagio': [1500000, 1200000],
+        'valor_bruto': [50e6, 40e6],
+    }))
+    assert not any(pd.api.types.is_integer_dtype(df[column])
+                   for column in ['prazo_medio', 'valor_desagio', 'valor_bruto'])
+
+    total_desagio, total_valor_operado, prazo_medio_geral = calculate_totals(df, True)
+    assert total_desagio == 2.7e6
+    assert total_valor_operado == 90e6
+    assert np.isclose(prazo_medio_geral, (60 * 50e6 + 90 * 40e6) / 90e6)
+
+def test_gerente_mapping_file_read_at_use(tmp_path, monkeypatch):
+    path = tmp_path / "gerentes.yaml"
+    path.write_text("GERENTE X: GX\n")
+    # Definido depois da importação (como pelo .env em connect_to_database)
+    monkeypatch.setenv("GERENTE_MAPPING_FILE", str(path))
+
+    df = normalize_gerentes(pd.DataFrame({'gerente': [" gerente x", "OUTRO", None]}))
+    assert df['gerente'].tolist()[:2] == ["GX", "OUTRO"]
+    assert pd.isna(df['gerente'].iloc[2])
@@ -0,0 +1,26 @@
+from datetime import date
+import pandas as pd
+import pytest
+from database import fetch_data, fetch_data_partitioned
+
+FILTERS = [
+    {},
+    {'start_date': date(2024, 2, 1), 'end_date': date(2024, 3, 15)},
+    {'gerentes': ["ALX", "MANUEL", "OUTRO GERENTE"]},
+    {'user_group': "LEANDRO AP", 'etapas': ["OPERADO", "PENDENTE"]},
+    {'cedentes': ["CEDENTE 3", "CEDENTE 52"], 'start_date': date(2024, 1, 15)},
+    {'missing_date': True},
+]
+
+def _sorted(df):
+    df = df.astype({column: object for column in df.select_dtypes('category').columns})
+    return df.sort_values(list(df.columns), na_position='last', ignore_index=True)
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("partitions", [2, 4, 7])
+def test_partitioned_fetch_matches_single_query(engine, partitions, filters):
+    expected = fetch_data(engine, partitions=1, **filters)
+    result = fetch_data_partitioned(engine, partitions=partitions, **filters)
+
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(_sorted(result), _sorted(expected), check_dtype=False)
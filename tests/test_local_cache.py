@@ -0,0 +1,79 @@
+import numpy as np
+from local_cache import sync_operations, ensure_synced, load_cache, load_rollup, read_metadata
+
+def _totals(df):
+    return len(df), int(df['data'].isna().sum()), float(df['valor_bruto'].sum()), float(df['valor_desagio'].sum())
+
+def test_delta_sync_keeps_undated_operations(engine, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+
+    full = sync_operations(engine, cache_dir=cache_dir)
+    assert read_metadata(cache_dir)['last_sync_mode'] == 'full'
+    assert full['data'].isna().sum() == 20
+
+    delta = sync_operations(engine, cache_dir=cache_dir)
+    assert read_metadata(cache_dir)['last_sync_mode'] == 'delta'
+
+    for df in (delta, load_cache(cache_dir, reuse=False)):
+        rows, undated, valor_bruto, valor_desagio = _totals(df)
+        assert (rows, undated) == _totals(full)[:2]
+        assert np.isclose(valor_bruto, _totals(full)[2])
+        assert np.isclose(valor_desagio, _totals(full)[3])
+
+def test_delta_sync_replaces_undated_operations(engine, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    sync_operations(engine, cache_dir=cache_dir)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM fato_operacoes WHERE rowid IN "
+                             "(SELECT rowid FROM fato_operacoes WHERE data IS NULL LIMIT 5)")
+
+    df = sync_operations(engine, cache_dir=cache_dir)
+    assert len(df) == 4995
+    assert df['data'].isna().sum() == 15
+
+def test_delta_sync_keeps_rollup_consistent(engine, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    sync_operations(engine, cache_dir=cache_dir)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO fato_operacoes VALUES "
+            "('CEDENTE 1', '00000000000001', 'OPERADO', NULL, 30, 3, 100), "
+            "('CEDENTE 2', '00000000000002', 'OPERADO', '2024-04-29', 30, 6, 200)"
+        )
+
+    df = sync_operations(engine, cache_dir=cache_dir)
+    rollup = load_rollup(cache_dir, reuse=False)
+    assert read_metadata(cache_dir)['last_sync_mode'] == 'delta'
+
+    assert rollup['operacoes'].sum() == len(df) == 5002
+    assert rollup.loc[rollup['dia'].isna(), 'operacoes'].sum() == df['data'].isna().sum() == 21
+    assert np.isclose(rollup['valor_bruto'].sum(), df['valor_bruto'].sum())
+    assert np.isclose(rollup['valor_desagio'].sum(), df['valor_desagio'].sum())
+
+def test_ensure_synced_respects_max_age(engine, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+
+    # Cache inexistente: sincroniza mesmo com max_age alto
+    assert ensure_synced(engine, max_age=3600, cache_dir=cache_dir)
+    assert read_metadata(cache_dir)['last_sync_mode'] == 'full'
+    last_sync = read_metadata(cache_dir)['last_sync']
+
+    assert not ensure_synced(engine, max_age=3600, cache_dir=cache_dir)
+    assert read_metadata(cache_dir)['last_sync'] == last_sync
+
+    # max_age=0 (recarga): delta buscado na hora
+    assert ensure_synced(engine, max_age=0, cache_dir=cache_dir)
+    assert read_metadata(cache_dir)['last_sync_mode'] == 'delta'
+    assert read_metadata(cache_dir)['last_sync'] != last_sync
+
+def test_cache_dir_read_at_use(engine, tmp_path, monkeypatch):
+    # Definido depois da importação (como pelo .env em connect_to_database)
+    monkeypatch.setenv("LOCAL_CACHE_DIR", str(tmp_path / "env_cache"))
+    monkeypatch.setenv("LOCAL_CACHE_SYNC_INTERVAL", "3600")
+
+    assert ensure_synced(engine)
+    assert (tmp_path / "env_cache" / "fato_operacoes.parquet").exists()
+    assert not ensure_synced(engine)
+    assert len(load_cache(reuse=False)) == 5000
@@ -0,0 +1,24 @@
+from io import BytesIO
+from reportlab.platypus import Table
+from database import fetch_data
+from data_processing import normalize_gerentes, aggregate_data
+from pdf_generator import create_document, create_totals_row, _iter_report_flowables
+
+def _by_column(df, row):
+    return dict(zip(df.columns, row))
+
+def _last_row(df, totals=None):
+    doc = create_document(BytesIO())
+    tables = [flowable for flowable in _iter_report_flowables(doc, df, [], [], totals) if isinstance(flowable, Table)]
+    return tables[-1]._cellvalues[-1]
+
+def test_totals_row_of_grouped_rows_matches_detail(engine):
+    detail = normalize_gerentes(fetch_data(engine))
+    grouped, totals = aggregate_data(detail)
+
+    expected = _by_column(detail, create_totals_row(detail))
+    assert _by_column(grouped, create_totals_row(grouped, totals)) == expected
+    assert _by_column(grouped, _last_row(grouped, totals)) == expected
+
+    # Sem os totais, as linhas agrupadas perdem os grupos com chave nula
+    assert _by_column(grouped, create_totals_row(grouped))['valor_bruto'] != expected['valor_bruto']
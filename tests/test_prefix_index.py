@@ -0,0 +1,47 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from database import fetch_data
+from data_processing import normalize_gerentes, index_by_date, aggregate_data
+from query_backend import filter_operations
+from rollup import build_rollup, filter_rollup, aggregate_rollup
+from prefix_index import build_prefix_index, selection_totals
+
+PERIOD = {'start_date': date(2024, 2, 1), 'end_date': date(2024, 3, 15)}
+
+SELECTIONS = [
+    ({}, "ADM"),
+    (PERIOD, "ADM"),
+    ({**PERIOD, 'cedentes': ["CEDENTE 3", "CEDENTE 4", "CEDENTE 52"]}, "ADM"),
+    ({'gerentes': ["ALX", "RFA"]}, "ADM"),
+    ({**PERIOD, 'gerentes': ["ALX", "LEANDRO AP"]}, "LEANDRO AP"),
+    (PERIOD, "MANUEL"),
+]
+
+@pytest.fixture
+def operations(engine):
+    df = index_by_date(normalize_gerentes(fetch_data(engine)))
+    cube = build_rollup(df)
+    return df, cube, build_prefix_index(cube)
+
+@pytest.mark.parametrize("selection, user_group", SELECTIONS)
+def test_index_totals_match_detail_aggregation(operations, selection, user_group):
+    df, cube, index = operations
+    totals = selection_totals(index, selection, user_group)
+    assert totals is not None
+
+    df_grouped, result = aggregate_rollup(filter_rollup(cube, selection, user_group), totals)
+    expected_grouped, expected = aggregate_data(filter_operations(df, selection, user_group))
+
+    assert expected[1] > 0
+    assert np.allclose(result, expected)
+    pd.testing.assert_frame_equal(
+        df_grouped[list(expected_grouped.columns)].astype({'cedente': str, 'gerente': str, 'etapa': str}),
+        expected_grouped.astype({'cedente': str, 'gerente': str, 'etapa': str}),
+        check_dtype=False, check_categorical=False
+    )
+
+def test_index_declines_etapa_selection(operations):
+    _, _, index = operations
+    assert selection_totals(index, {'etapas': ["OPERADO"]}, "ADM") is None
@@ -0,0 +1,53 @@
+from datetime import date
+import numpy as np
+import pytest
+from local_cache import sync_operations, DATA_FILE
+from query_backend import filter_operations, pandas_aggregated_data, duckdb_aggregated_data, compare_aggregated
+from comissao import chart_data
+
+pytest.importorskip("duckdb")
+
+SELECTIONS = [
+    ({}, "ADM"),
+    ({'start_date': date(2024, 2, 1), 'end_date': date(2024, 3, 1)}, "ADM"),
+    ({}, "ALX"),
+    ({'etapas': ["OPERADO", "PENDENTE"], 'gerentes': ["RFA"]}, "ADM"),
+    ({'cedentes': ["CEDENTE 3", "CEDENTE 52"]}, "LEANDRO AP"),
+    ({'cedentes': ["CEDENTE INEXISTENTE"]}, "ADM"),
+]
+
+@pytest.fixture
+def cached_operations(engine, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    df = sync_operations(engine, cache_dir=cache_dir)
+    return df, str(tmp_path / "cache" / DATA_FILE)
+
+@pytest.mark.parametrize("selection, user_group", SELECTIONS)
+def test_duckdb_aggregation_matches_pandas(cached_operations, selection, user_group):
+    df, source = cached_operations
+    expected = pandas_aggregated_data(df, user_group, **selection)
+    result = duckdb_aggregated_data(source, user_group, **selection)
+    assert compare_aggregated(expected, result) == []
+
+def test_compare_aggregated_reports_differences(cached_operations):
+    df, source = cached_operations
+    expected = pandas_aggregated_data(df, "ADM")
+    grouped, totals = duckdb_aggregated_data(source, "ADM")
+
+    renamed = grouped.assign(gerente=grouped['gerente'].replace({"ALX": "OUTRO"}))
+    assert compare_aggregated(expected, (renamed, totals)) == ["coluna gerente"]
+
+    changed = grouped.copy()
+    changed.loc[0, 'valor_bruto'] += 1
+    assert compare_aggregated(expected, (changed, totals)) == ["coluna valor_bruto"]
+
+@pytest.mark.parametrize("selection, user_group", SELECTIONS)
+def test_duckdb_chart_cells_keep_operations_with_null_keys(cached_operations, selection, user_group):
+    df, source = cached_operations
+    expected = chart_data(filter_operations(df, selection, user_group))
+    result = chart_data(duckdb_aggregated_data(source, user_group, with_cells=True, **selection)[2])
+
+    assert list(result) == list(expected)
+    for column, series in expected.items():
+        assert list(result[column].index.astype(str)) == list(series.index.astype(str)), column
+        assert np.allclose(result[column].to_numpy(), series.to_numpy()), column
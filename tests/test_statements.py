@@ -0,0 +1,52 @@
+import os
+import re
+import base64
+import zlib
+from datetime import date
+import numpy as np
+from database import fetch_data
+from data_processing import normalize_gerentes, format_dataframes
+from formatting import format_currency, format_decimal
+from statements import run_statements, split_statements, label_missing
+
+START, END = date(2024, 1, 1), date(2024, 12, 31)
+
+def _pdf_text(path):
+    """Conteúdo (descomprimido) das páginas de um PDF gerado pelo ReportLab."""
+    with open(path, "rb") as file:
+        content = file.read()
+    streams = re.findall(rb"/Filter \[ /ASCII85Decode /FlateDecode \].*?stream\r?\n(.*?)~>", content, re.S)
+    return b"\n".join(
+        zlib.decompress(base64.a85decode(stream.replace(b"\n", b""))) for stream in streams
+    ).decode("latin-1")
+
+def _summary_strings(summary):
+    return [
+        f"({format_currency(summary['total_desagio'])})",
+        f"({format_currency(summary['total_valor_operado'])})",
+        f"({format_decimal(summary['prazo_medio_geral'], 2)})",
+    ]
+
+def test_statement_totals_match_manifest(engine, tmp_path):
+    df = normalize_gerentes(fetch_data(engine))
+    output_dir = str(tmp_path / "extratos")
+    manifest = run_statements(df, output_dir, START, END, workers=1)
+
+    assert 'falhas' not in manifest
+    assert "SEM_GERENTE.pdf" in manifest['extratos']
+    assert sum(entry['operacoes'] for entry in manifest['extratos'].values()) == len(df)
+    assert np.isclose(
+        sum(entry['total_valor_operado'] for entry in manifest['extratos'].values()),
+        manifest['total']['total_valor_operado']
+    )
+
+    for name, entry in manifest['extratos'].items():
+        text = _pdf_text(os.path.join(output_dir, name))
+        for expected in _summary_strings(entry):
+            assert expected in text, (name, expected)
+
+def test_statement_table_keeps_every_operation(engine):
+    df = normalize_gerentes(fetch_data(engine))
+    for keys, part in split_statements(df):
+        df_grouped = format_dataframes(label_missing(part), numeric=True)[0]
+        assert np.isclose(df_grouped['VALOR OPERADO'].sum(), part['valor_bruto'].astype('float64').sum()), keys
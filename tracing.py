@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+def get_timing_history():
+    """
+    Número de medições guardadas por etapa para os percentis
+    (TIMING_HISTORY, padrão 500), lido depois do .env carregado por
+    database.connect_to_database.
+    """
+    return int(os.getenv("TIMING_HISTORY", "500"))
+
+# Log estruturado (uma linha JSON por execução da página): stderr ou o
+# arquivo em TIMING_LOG, configurado no primeiro registro (depois do .env)
+logger = logging.getLogger("comissionamento.timing")
+_logger_lock = threading.Lock()
+
+def _get_logger():
+    with _logger_lock:
+        if not logger.handlers:
+            handler = logging.FileHandler(os.environ["TIMING_LOG"]) if os.getenv("TIMING_LOG") else logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+    return logger
+
+# Execução em andamento por thread (cada sessão do Streamlit roda o script
+# em uma thread)
+_local = threading.local()
+
+_history_lock = threading.Lock()
+_history = {}  # etapa -> deque de durações (ms)
+
+def _rss_mb():
+    """Memória residente do processo em MB (None fora do Linux)."""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _rows(value):
+    """Número de linhas de um DataFrame (ou do primeiro item de uma tupla)."""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if hasattr(value, 'shape') and hasattr(value, 'columns'):
+        return len(value)
+    return None
+
+def start_trace(**context):
+    """
+    Inicia a medição de uma execução da página na thread atual.
+
+    Args:
+        **context: Informações gravadas no log (ex.: page, user_group)
+    """
+    _local.trace = {
+        'run': uuid.uuid4().hex[:12],
+        'context': context,
+        'start': time.perf_counter(),
+        'spans': [],
+        'depth': 0,
+    }
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+@contextmanager
+def span(stage, rows_in=None):
+    """
+    Mede uma etapa: duração, memória residente antes e depois e linhas.
+
+    Fora de uma execução iniciada por start_trace não mede nada. O registro
+    é entregue ao bloco, que pode preencher 'rows_out'.
+
+    Exemplo:
+        with span('fetch_data') as record:
+            df = fetch_data(engine)
+            record['rows_out'] = len(df)
+    """
+    trace = current_trace()
+    if trace is None:
+        yield {}
+        return
+
+    record = {'stage': stage, 'depth': trace['depth'], 'rows_in': rows_in, 'rows_out': None}
+    memory_before = _rss_mb()
+    start = time.perf_counter()
+    trace['depth'] += 1
+    try:
+        yield record
+    finally:
+        trace['depth'] -= 1
+        record['duration_ms'] = (time.perf_counter() - start) * 1000
+        memory_after = _rss_mb()
+        if memory_before is not None and memory_after is not None:
+            record['memory_delta_MB'] = memory_after - memory_before
+        trace['spans'].append(record)
+
+def traced(stage=None):
+    """
+    Decorador que mede a função como uma etapa (ver span), com as linhas do
+    primeiro argumento e do resultado quando forem DataFrames.
+    """
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_trace() is None:
+                return func(*args, **kwargs)
+
+            with span(name, _rows(args[0]) if args else None) as record:
+                result = func(*args, **kwargs)
+                record['rows_out'] = _rows(result)
+            return result
+
+        return wrapper
+    return decorator
+
+def finish_trace(**context):
+    """
+    Encerra a execução da thread atual: grava a linha de log JSON e acumula
+    as durações no histórico usado pelos percentis.
+
+    Args:
+        **context: Informações adicionais para o log (ex.: user_group)
+
+    Returns:
+        dict or None: Execução medida
+    """
+    trace = current_trace()
+    if trace is None:
+        return None
+    _local.trace = None
+
+    result = {
+        'run': trace['run'],
+        **trace['context'],
+        **context,
+        'total_ms': (time.perf_counter() - trace['start']) * 1000,
+        'spans': trace['spans'],
+    }
+    _get_logger().info(json.dumps(result, default=str))
+
+    with _history_lock:
+        for record in trace['spans'] + [{'stage': 'total', 'duration_ms': result['total_ms']}]:
+            _history.setdefault(record['stage'], deque(maxlen=get_timing_history())).append(record['duration_ms'])
+
+    return result
+
+def stage_percentiles(percentiles=(50, 90, 99)):
+    """
+    Percentis das durações recentes (ms) por etapa.
+
+    Returns:
+        list: Um dicionário por etapa com 'stage', 'count' e 'p50', 'p90'...
+    """
+    with _history_lock:
+        history = {stage: np.array(durations) for stage, durations in _history.items()}
+
+    rows = []
+    for stage, durations in history.items():
+        row = {'stage': stage, 'count': len(durations)}
+        for percentile, value in zip(percentiles, np.percentile(durations, percentiles)):
+            row[f'p{percentile}'] = round(float(value), 1)
+        rows.append(row)
+    return rows